@@ -1,4 +1,6 @@
 import os
+import click
+import logging
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -10,6 +12,13 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '.env'), override=True)
 
 migrate = Migrate()
 
+def _is_cli_command():
+    """True when loaded by a flask command other than the development server"""
+    if os.getenv('FLASK_RUN_FROM_CLI') != 'true':
+        return False
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.info_name != 'run'
+
 def create_app():
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
@@ -22,7 +31,7 @@ def create_app():
         'https://*.netlify.app',
         'https://fatoora-beta.vercel.app',  # Explicit domain
         'https://fatoora-beta-production.up.railway.app'  # Self-reference for testing
-    ])
+    ], expose_headers=['X-Next-Cursor'])
 
     # Initialize extensions
     db.init_app(app)
@@ -30,7 +39,7 @@ def create_app():
 
     # Import models WITHIN app context to avoid circular imports
     with app.app_context():
-        from models import user, team, teammembership, client, invoice, invoice_item
+        from models import user, team, teammembership, client, invoice, invoice_item, team_stats, job, invoice_sequence, team_change
         
         # Create tables if they don't exist (for development)
         db.create_all()
@@ -42,6 +51,10 @@ def create_app():
     from routes.dashboard import dashboard_bp
     from routes.export import export_bp
     from routes.teams import teams_bp
+    from routes.jobs import jobs_bp
+    from routes.search import search_bp
+    from routes.sync import sync_bp
+    from routes.events import events_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(clients_bp, url_prefix='/api/clients')
@@ -49,6 +62,48 @@ def create_app():
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     app.register_blueprint(export_bp, url_prefix='/api/export')
     app.register_blueprint(teams_bp, url_prefix='/api/teams')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    app.register_blueprint(search_bp, url_prefix='/api/search')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
+
+    from utils.overdue import sweep_overdue_invoices, start_overdue_sweeper
+
+    @app.cli.command('sweep-overdue')
+    def sweep_overdue_command():
+        """Mark lapsed unpaid invoices as overdue."""
+        print(f"{sweep_overdue_invoices()} invoices marked overdue")
+
+    from utils.rollups import rebuild_rollups
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--team-id', type=int, default=None, help='Only rebuild this team')
+    def rebuild_rollups_command(team_id):
+        """Recompute team_stats and team_monthly_revenue from invoices."""
+        stats, monthly = rebuild_rollups(team_id)
+        print(f"Rebuilt {stats} team_stats rows and {monthly} team_monthly_revenue rows")
+
+    from utils.jobs import purge_jobs, resume_queued_jobs
+
+    @app.cli.command('purge-jobs')
+    @click.option('--max-age-hours', type=int, default=None, help='Defaults to JOB_RETENTION_HOURS')
+    def purge_jobs_command(max_age_hours):
+        """Delete finished background jobs and their artifacts."""
+        purged = purge_jobs(max_age_hours) if max_age_hours is not None else purge_jobs()
+        print(f"Purged {purged} jobs")
+
+    # Pick up jobs a previous process queued but never ran; not for one-off CLI commands
+    # (migrations, purge-jobs), whose process would exit under the running jobs
+    if os.getenv('RESUME_QUEUED_JOBS', '1') == '1' and not _is_cli_command():
+        try:
+            resume_queued_jobs(app)
+        except Exception as e:
+            logging.error(f"Could not resume queued jobs: {str(e)}")
+
+    # Optional in-process sweeper; reads derive overdue status, so this only keeps stored rows tidy
+    sweep_interval = int(os.getenv('OVERDUE_SWEEP_INTERVAL_SECONDS', '0'))
+    if sweep_interval > 0:
+        start_overdue_sweeper(app, sweep_interval)
 
     return app
 
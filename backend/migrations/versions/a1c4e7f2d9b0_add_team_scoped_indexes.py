@@ -0,0 +1,88 @@
+"""Add composite indexes for team-scoped access paths
+
+Revision ID: a1c4e7f2d9b0
+Revises: 9f8e7d6c5b4a
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e7f2d9b0'
+down_revision = '9f8e7d6c5b4a'
+branch_labels = None
+depends_on = None
+
+# Duplicates listed when the unique number index cannot be created
+MAX_LISTED_DUPLICATES = 50
+
+
+def check_duplicate_numbers():
+    """Stop before creating uq_invoices_team_id_number if a team holds an invoice number twice.
+
+    Numbers appear on issued invoices, so they are not renumbered here; change the listed
+    invoices' numbers (or delete the copies) and run the upgrade again.
+    """
+    if op.get_context().as_sql:
+        # Offline (--sql) runs cannot query the data
+        return
+    rows = op.get_bind().execute(sa.text(
+        'SELECT team_id, number, COUNT(*) AS copies, MIN(id) AS first_id, MAX(id) AS last_id '
+        'FROM invoices GROUP BY team_id, number HAVING COUNT(*) > 1 '
+        'ORDER BY team_id, number'
+    )).fetchall()
+    if not rows:
+        return
+    listed = '\n'.join(
+        f'  team {row.team_id}: number {row.number!r} used by {row.copies} invoices (ids {row.first_id}..{row.last_id})'
+        for row in rows[:MAX_LISTED_DUPLICATES]
+    )
+    if len(rows) > MAX_LISTED_DUPLICATES:
+        listed += f'\n  ... and {len(rows) - MAX_LISTED_DUPLICATES} more'
+    raise RuntimeError(
+        f'Cannot create uq_invoices_team_id_number: {len(rows)} invoice numbers are used more than '
+        f'once within a team. Renumber or remove these invoices, then upgrade again:\n{listed}\n'
+        'Find all of them with: SELECT team_id, number, id FROM invoices WHERE (team_id, number) IN '
+        '(SELECT team_id, number FROM invoices GROUP BY team_id, number HAVING COUNT(*) > 1) '
+        'ORDER BY team_id, number, id'
+    )
+
+
+def upgrade():
+    check_duplicate_numbers()
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.create_index('ix_invoices_team_id_status_created_at', ['team_id', 'status', 'created_at'], unique=False)
+        batch_op.create_index('ix_invoices_team_id_created_at_id', ['team_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_invoices_team_id_client_id', ['team_id', 'client_id'], unique=False)
+        # check_duplicate_numbers has ruled out duplicates within a team
+        batch_op.create_index('uq_invoices_team_id_number', ['team_id', 'number'], unique=True)
+
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.create_index('ix_clients_team_id_id', ['team_id', 'id'], unique=False)
+
+    with op.batch_alter_table('team_memberships', schema=None) as batch_op:
+        batch_op.create_index('ix_team_memberships_user_id_team_id', ['user_id', 'team_id'], unique=False)
+        batch_op.create_index('ix_team_memberships_team_id', ['team_id'], unique=False)
+
+    with op.batch_alter_table('invoice_items', schema=None) as batch_op:
+        batch_op.create_index('ix_invoice_items_invoice_id', ['invoice_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('invoice_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_invoice_items_invoice_id')
+
+    with op.batch_alter_table('team_memberships', schema=None) as batch_op:
+        batch_op.drop_index('ix_team_memberships_team_id')
+        batch_op.drop_index('ix_team_memberships_user_id_team_id')
+
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_index('ix_clients_team_id_id')
+
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.drop_index('uq_invoices_team_id_number')
+        batch_op.drop_index('ix_invoices_team_id_client_id')
+        batch_op.drop_index('ix_invoices_team_id_created_at_id')
+        batch_op.drop_index('ix_invoices_team_id_status_created_at')
@@ -0,0 +1,29 @@
+"""Add teams.data_version and teams.data_updated_at
+
+Revision ID: a9c5e3f7d2b4
+Revises: f3b7d9e1a5c8
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c5e3f7d2b4'
+down_revision = 'f3b7d9e1a5c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Validators for conditional GETs; bumped by every write to the team's data
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('data_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.drop_column('data_updated_at')
+        batch_op.drop_column('data_version')
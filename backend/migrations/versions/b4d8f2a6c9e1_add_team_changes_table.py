@@ -0,0 +1,38 @@
+"""Add team_changes table
+
+Revision ID: b4d8f2a6c9e1
+Revises: a9c5e3f7d2b4
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d8f2a6c9e1'
+down_revision = 'a9c5e3f7d2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per entity, overwritten on every change; entities older than this table are
+    # picked up by a full reload, which /api/sync requests when given no version
+    op.create_table('team_changes',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id', 'kind', 'entity_id')
+    )
+    with op.batch_alter_table('team_changes', schema=None) as batch_op:
+        batch_op.create_index('ix_team_changes_team_id_version', ['team_id', 'version'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('team_changes', schema=None) as batch_op:
+        batch_op.drop_index('ix_team_changes_team_id_version')
+    op.drop_table('team_changes')
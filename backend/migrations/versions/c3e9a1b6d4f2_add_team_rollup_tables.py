@@ -0,0 +1,66 @@
+"""Add team_stats and team_monthly_revenue rollup tables
+
+Revision ID: c3e9a1b6d4f2
+Revises: b7d2f5a8c3e1
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e9a1b6d4f2'
+down_revision = 'b7d2f5a8c3e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    team_stats = op.create_table('team_stats',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('currency', sa.String(), nullable=False),
+    sa.Column('invoice_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id', 'status', 'currency')
+    )
+    team_monthly_revenue = op.create_table('team_monthly_revenue',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(), nullable=False),
+    sa.Column('paid_count', sa.Integer(), nullable=False),
+    sa.Column('paid_amount', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id', 'year', 'month', 'currency')
+    )
+
+    # Backfill from existing invoices; `flask rebuild-rollups` does the same later on
+    invoices = sa.table('invoices',
+        sa.column('id', sa.Integer), sa.column('team_id', sa.Integer), sa.column('status', sa.String),
+        sa.column('currency', sa.String), sa.column('amount', sa.Float), sa.column('created_at', sa.DateTime))
+    status = sa.func.coalesce(invoices.c.status, 'unpaid')
+    currency = sa.func.coalesce(invoices.c.currency, 'MAD')
+    op.execute(team_stats.insert().from_select(
+        ['team_id', 'status', 'currency', 'invoice_count', 'total_amount'],
+        sa.select(invoices.c.team_id, status, currency, sa.func.count(invoices.c.id),
+                  sa.func.coalesce(sa.func.sum(invoices.c.amount), 0))
+        .where(invoices.c.team_id.isnot(None))
+        .group_by(invoices.c.team_id, status, currency)
+    ))
+    year = sa.cast(sa.extract('year', invoices.c.created_at), sa.Integer)
+    month = sa.cast(sa.extract('month', invoices.c.created_at), sa.Integer)
+    op.execute(team_monthly_revenue.insert().from_select(
+        ['team_id', 'year', 'month', 'currency', 'paid_count', 'paid_amount'],
+        sa.select(invoices.c.team_id, year, month, currency, sa.func.count(invoices.c.id),
+                  sa.func.coalesce(sa.func.sum(invoices.c.amount), 0))
+        .where(invoices.c.team_id.isnot(None), invoices.c.status == 'paid', invoices.c.created_at.isnot(None))
+        .group_by(invoices.c.team_id, year, month, currency)
+    ))
+
+
+def downgrade():
+    op.drop_table('team_monthly_revenue')
+    op.drop_table('team_stats')
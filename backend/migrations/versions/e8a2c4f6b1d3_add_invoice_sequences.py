@@ -0,0 +1,35 @@
+"""Add invoice_sequences table and teams.invoice_number_format
+
+Revision ID: e8a2c4f6b1d3
+Revises: d5f1b3c7e9a4
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a2c4f6b1d3'
+down_revision = 'd5f1b3c7e9a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sequences are seeded from existing invoice numbers on first use
+    op.create_table('invoice_sequences',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id', 'scope')
+    )
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('invoice_number_format', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.drop_column('invoice_number_format')
+    op.drop_table('invoice_sequences')
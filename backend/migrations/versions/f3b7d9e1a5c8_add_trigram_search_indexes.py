@@ -0,0 +1,41 @@
+"""Add pg_trgm indexes backing /api/search on Postgres
+
+Revision ID: f3b7d9e1a5c8
+Revises: e8a2c4f6b1d3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7d9e1a5c8'
+down_revision = 'e8a2c4f6b1d3'
+branch_labels = None
+depends_on = None
+
+# Expressions match utils.search, which filters on lower(column) LIKE '%term%'
+TRIGRAM_INDEXES = [
+    ('ix_clients_name_trgm', 'clients', 'name'),
+    ('ix_clients_ice_trgm', 'clients', 'ice'),
+    ('ix_clients_if_number_trgm', 'clients', 'if_number'),
+    ('ix_clients_phone_trgm', 'clients', 'phone'),
+    ('ix_invoices_number_trgm', 'invoices', 'number'),
+    ('ix_invoice_items_description_trgm', 'invoice_items', 'description'),
+]
+
+
+def upgrade():
+    # Other databases search through the in-memory index in utils.search
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (lower({column}) gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -2,6 +2,9 @@ from database import db
 
 class Client(db.Model):
     __tablename__ = 'clients'
+    __table_args__ = (
+        db.Index('ix_clients_team_id_id', 'team_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
     name = db.Column(db.String, nullable=False)
@@ -1,8 +1,17 @@
 from database import db
 from datetime import datetime
+from sqlalchemy import and_, case, or_
+from sqlalchemy.ext.hybrid import hybrid_property
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_team_id_status_created_at', 'team_id', 'status', 'created_at'),
+        db.Index('ix_invoices_team_id_created_at_id', 'team_id', 'created_at', 'id'),
+        db.Index('ix_invoices_team_id_client_id', 'team_id', 'client_id'),
+        db.Index('uq_invoices_team_id_number', 'team_id', 'number', unique=True),
+        db.Index('ix_invoices_status_due_date', 'status', 'due_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
@@ -15,4 +24,29 @@ class Invoice(db.Model):
     # Relationships
     team = db.relationship('Team')
     client = db.relationship('Client')
-    items = db.relationship('InvoiceItem', back_populates='invoice', cascade='all, delete-orphan') 
\ No newline at end of file
+    items = db.relationship('InvoiceItem', back_populates='invoice', cascade='all, delete-orphan')
+
+    @hybrid_property
+    def current_status(self):
+        """Stored status, with lapsed unpaid invoices reported as overdue"""
+        if self.status == 'unpaid' and self.due_date and self.due_date < datetime.utcnow().date():
+            return 'overdue'
+        return self.status
+
+    @current_status.expression
+    def current_status(cls):
+        today = datetime.utcnow().date()
+        return case(
+            (and_(cls.status == 'unpaid', cls.due_date < today), 'overdue'),
+            else_=cls.status
+        )
+
+    @classmethod
+    def current_status_is(cls, status):
+        """Index-friendly predicate equivalent to current_status == status"""
+        today = datetime.utcnow().date()
+        if status == 'overdue':
+            return or_(cls.status == 'overdue', and_(cls.status == 'unpaid', cls.due_date < today))
+        if status == 'unpaid':
+            return and_(cls.status == 'unpaid', or_(cls.due_date.is_(None), cls.due_date >= today))
+        return cls.status == status
@@ -0,0 +1,9 @@
+from database import db
+
+class InvoiceSequence(db.Model):
+    """Last invoice number handed out per team and numbering scope, maintained by utils.invoice_numbers"""
+    __tablename__ = 'invoice_sequences'
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    # '' for a sequence that never resets, else the year it counts
+    scope = db.Column(db.String, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
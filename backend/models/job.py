@@ -0,0 +1,25 @@
+from database import db
+from datetime import datetime
+
+class Job(db.Model):
+    """Background export/render job; the table doubles as the queue (see utils.jobs)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_team_id_created_at', 'team_id', 'created_at'),
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at'),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    kind = db.Column(db.String, nullable=False)
+    params = db.Column(db.Text)  # JSON
+    status = db.Column(db.String, nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    artifact_path = db.Column(db.String)
+    artifact_name = db.Column(db.String)
+    mimetype = db.Column(db.String)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
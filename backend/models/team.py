@@ -13,6 +13,9 @@ class Team(db.Model):
     address = db.Column(db.Text)  # Business address
     phone = db.Column(db.String)  # Business phone
     email = db.Column(db.String)  # Business email
+    invoice_number_format = db.Column(db.String)  # e.g. 'FAC-{year}-{n:04d}'; None means '{n}'
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bumped on every write, see utils.conditional
+    data_updated_at = db.Column(db.DateTime)
     # Relationships
     memberships = db.relationship('TeamMembership', back_populates='team')
     owner = db.relationship('User', foreign_keys=[owner_id]) 
\ No newline at end of file
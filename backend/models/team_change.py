@@ -0,0 +1,14 @@
+from database import db
+
+class TeamChange(db.Model):
+    """Team data version at which each client, invoice or team settings last changed, maintained by utils.changes"""
+    __tablename__ = 'team_changes'
+    __table_args__ = (
+        db.Index('ix_team_changes_team_id_version', 'team_id', 'version'),
+    )
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    kind = db.Column(db.String, primary_key=True)  # 'client', 'invoice' or 'team'
+    entity_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    # Tombstone: the entity was deleted at this version
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
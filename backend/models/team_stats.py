@@ -0,0 +1,20 @@
+from database import db
+
+class TeamStats(db.Model):
+    """Per-team invoice totals by stored status and currency, maintained by utils.rollups"""
+    __tablename__ = 'team_stats'
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    status = db.Column(db.String, primary_key=True)
+    currency = db.Column(db.String, primary_key=True)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+
+class TeamMonthlyRevenue(db.Model):
+    """Paid revenue per team, invoice month and currency, maintained by utils.rollups"""
+    __tablename__ = 'team_monthly_revenue'
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String, primary_key=True)
+    paid_count = db.Column(db.Integer, nullable=False, default=0)
+    paid_amount = db.Column(db.Float, nullable=False, default=0)
@@ -1,57 +1,94 @@
 from flask import Blueprint, request, jsonify, abort
-from utils.firebase_auth import verify_firebase_token
+from utils.team_context import get_current_user_and_team
 from models.client import Client
-from models.team import Team
-from models.teammembership import TeamMembership
-from models.user import User
+from models.invoice import Invoice
+from utils.pdf_cache import pdf_cache
+from utils.imports import request_records, import_clients
+from utils.search import invalidate_search, update_search
 from database import db
+from sqlalchemy import case, func
+from utils.pagination import encode_cursor, decode_cursor, get_page_size, paginated_response
+from utils.conditional import conditional_get
+from utils.changes import record_changes
 
 clients_bp = Blueprint('clients', __name__)
 
-# Helper: get current user and team
+def _invalidate_client_pdfs(team_id, client_id):
+    """Client fields are printed on invoices; drop cached PDFs of their invoices"""
+    invoice_ids = db.session.query(Invoice.id).filter_by(team_id=team_id, client_id=client_id).all()
+    for (invoice_id,) in invoice_ids:
+        pdf_cache.invalidate_invoice(team_id, invoice_id)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+def client_list_query(team_id):
+    """The client list columns; shared with /api/sync"""
+    return db.session.query(
+        Client.id, Client.name, Client.phone, Client.ice, Client.if_number
+    ).filter(Client.team_id == team_id)
 
-@clients_bp.route('/', methods=['GET'])
-def list_clients():
-    user, team = get_current_user_and_team()
-    clients = Client.query.filter_by(team_id=team.id).all()
-    return jsonify([{
+def client_list_item(c):
+    return {
         'id': c.id,
         'name': c.name,
         'phone': c.phone,
         'ice': c.ice,
         'if_number': c.if_number
-    } for c in clients])
+    }
+
+def _client_stats(team_id, client_ids):
+    """Invoice count, last invoice date and per-currency paid/outstanding totals per client, in one grouped query"""
+    paid = Invoice.status == 'paid'
+    rows = db.session.query(
+        Invoice.client_id, Invoice.currency, func.count(Invoice.id),
+        func.coalesce(func.sum(case((paid, Invoice.amount), else_=0)), 0),
+        func.coalesce(func.sum(case((paid, 0), else_=Invoice.amount)), 0),
+        func.max(Invoice.created_at)
+    ).filter(
+        Invoice.team_id == team_id, Invoice.client_id.in_(client_ids)
+    ).group_by(Invoice.client_id, Invoice.currency).all()
+    stats = {}
+    for client_id, currency, count, paid_amount, outstanding_amount, last_invoice_at in rows:
+        entry = stats.setdefault(client_id, {'invoice_count': 0, 'last_invoice_at': None, 'totals': []})
+        entry['invoice_count'] += count
+        if last_invoice_at and (entry['last_invoice_at'] is None or last_invoice_at > entry['last_invoice_at']):
+            entry['last_invoice_at'] = last_invoice_at
+        entry['totals'].append({
+            'currency': currency,
+            'paid_amount': float(paid_amount),
+            'outstanding_amount': float(outstanding_amount)
+        })
+    for entry in stats.values():
+        entry['last_invoice_at'] = entry['last_invoice_at'].isoformat() if entry['last_invoice_at'] else None
+    return stats
+
+@clients_bp.route('/', methods=['GET'])
+@conditional_get
+def list_clients():
+    """Clients in id order, keyset-paginated; ?include=stats embeds per-client invoice aggregates"""
+    user, team = get_current_user_and_team()
+    query = client_list_query(team.id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            abort(400, 'Invalid cursor')
+        query = query.filter(Client.id > values[0])
+
+    limit = get_page_size()
+    rows = query.order_by(Client.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+
+    clients = [client_list_item(c) for c in rows]
+    include = set(filter(None, request.args.get('include', '').split(',')))
+    if 'stats' in include and clients:
+        stats = _client_stats(team.id, [c['id'] for c in clients])
+        empty = {'invoice_count': 0, 'last_invoice_at': None, 'totals': []}
+        for c in clients:
+            c['stats'] = stats.get(c['id'], empty)
+    return paginated_response(clients, next_cursor)
 
 @clients_bp.route('/', methods=['POST'])
 def create_client():
@@ -65,10 +102,22 @@ def create_client():
         if_number=data.get('if_number')
     )
     db.session.add(client)
+    db.session.flush()
+    record_changes(team.id, 'client', [client.id])
     db.session.commit()
+    update_search(team.id, 'client', [client.id])
     return jsonify({'id': client.id}), 201
 
+@clients_bp.route('/import', methods=['POST'])
+def import_clients_route():
+    """Bulk create clients from a CSV or JSON-lines upload; returns a per-row error report"""
+    user, team = get_current_user_and_team()
+    report = import_clients(team.id, request_records())
+    invalidate_search(team.id)
+    return jsonify(report.to_dict())
+
 @clients_bp.route('/<int:client_id>', methods=['GET'])
+@conditional_get
 def get_client(client_id):
     user, team = get_current_user_and_team()
     client = Client.query.filter_by(id=client_id, team_id=team.id).first()
@@ -93,7 +142,10 @@ def update_client(client_id):
     client.phone = data.get('phone', client.phone)
     client.ice = data.get('ice', client.ice)
     client.if_number = data.get('if_number', client.if_number)
+    record_changes(team.id, 'client', [client.id])
     db.session.commit()
+    _invalidate_client_pdfs(team.id, client.id)
+    update_search(team.id, 'client', [client.id])
     return jsonify({'success': True})
 
 @clients_bp.route('/<int:client_id>', methods=['DELETE'])
@@ -102,6 +154,9 @@ def delete_client(client_id):
     client = Client.query.filter_by(id=client_id, team_id=team.id).first()
     if not client:
         abort(404, 'Client not found')
+    _invalidate_client_pdfs(team.id, client.id)
     db.session.delete(client)
+    record_changes(team.id, 'client', [client_id], deleted=True)
     db.session.commit()
+    update_search(team.id, 'client', [client_id], deleted=True)
     return jsonify({'success': True}) 
\ No newline at end of file
@@ -1,78 +1,199 @@
-from flask import Blueprint, jsonify, abort
-from utils.firebase_auth import verify_firebase_token
+from flask import Blueprint, request, jsonify, abort
+from utils.team_context import get_current_user_and_team
+from utils.conditional import conditional_get
 from models.invoice import Invoice
-from models.teammembership import TeamMembership
-from models.user import User
-from models.team import Team
+from models.client import Client
+from models.team_stats import TeamStats, TeamMonthlyRevenue
 from database import db
-from datetime import datetime
-from sqlalchemy import extract, func
+from datetime import datetime, date, timedelta
+from sqlalchemy import func
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
-
 @dashboard_bp.route('/summary', methods=['GET'])
+@conditional_get
 def summary():
     user, team = get_current_user_and_team()
-    invoices = Invoice.query.filter_by(team_id=team.id).all()
-    total = len(invoices)
-    paid = sum(1 for i in invoices if i.status == 'paid')
-    unpaid = sum(1 for i in invoices if i.status == 'unpaid')
-    overdue = sum(1 for i in invoices if i.status == 'overdue')
-    total_revenue = sum(i.amount for i in invoices if i.status == 'paid')
-    return jsonify({
+    # Precomputed totals by stored status, maintained by utils.rollups
+    buckets = {
+        (row.status, row.currency): [row.invoice_count, row.total_amount]
+        for row in TeamStats.query.filter_by(team_id=team.id).all()
+    }
+    # Unpaid invoices that lapsed since the last sweep still count as overdue
+    lapsed = db.session.query(
+        func.coalesce(Invoice.currency, 'MAD'), func.count(Invoice.id), func.coalesce(func.sum(Invoice.amount), 0)
+    ).filter(
+        Invoice.team_id == team.id,
+        Invoice.status == 'unpaid',
+        Invoice.due_date < datetime.utcnow().date()
+    ).group_by(func.coalesce(Invoice.currency, 'MAD')).all()
+    for currency, count, amount in lapsed:
+        unpaid = buckets.setdefault(('unpaid', currency), [0, 0])
+        overdue = buckets.setdefault(('overdue', currency), [0, 0])
+        unpaid[0] -= count
+        unpaid[1] -= float(amount)
+        overdue[0] += count
+        overdue[1] += float(amount)
+
+    counts = {'paid': 0, 'unpaid': 0, 'overdue': 0}
+    by_status = []
+    total = 0
+    total_revenue = 0
+    for (row_status, currency), (count, amount) in sorted(buckets.items()):
+        if count <= 0:
+            continue
+        counts[row_status] = counts.get(row_status, 0) + count
+        total += count
+        if row_status == 'paid':
+            total_revenue += float(amount)
+        by_status.append({'status': row_status, 'currency': currency, 'count': count, 'amount': float(amount)})
+
+    result = {
         'total_invoices': total,
-        'paid': paid,
-        'unpaid': unpaid,
-        'overdue': overdue,
-        'total_revenue': total_revenue
-    })
+        'paid': counts['paid'],
+        'unpaid': counts['unpaid'],
+        'overdue': counts['overdue'],
+        'total_revenue': total_revenue,
+        'by_status': by_status
+    }
+
+    # Optional breakdowns, e.g. ?include=outstanding,top_clients
+    include = set(filter(None, request.args.get('include', '').split(',')))
+    if 'outstanding' in include:
+        outstanding = {}
+        for entry in by_status:
+            if entry['status'] in ('unpaid', 'overdue'):
+                bucket = outstanding.setdefault(entry['currency'], {'outstanding': 0, 'overdue': 0})
+                bucket['outstanding'] += entry['amount']
+                if entry['status'] == 'overdue':
+                    bucket['overdue'] += entry['amount']
+        result['outstanding'] = [
+            {'currency': currency, 'outstanding_amount': amounts['outstanding'], 'overdue_amount': amounts['overdue']}
+            for currency, amounts in outstanding.items()
+        ]
+    if 'top_clients' in include:
+        limit = min(request.args.get('top', 5, type=int), 50)
+        paid_total = func.sum(Invoice.amount).label('paid_total')
+        top = db.session.query(
+            Client.id, Client.name, Invoice.currency, paid_total, func.count(Invoice.id)
+        ).join(Client, Client.id == Invoice.client_id).filter(
+            Invoice.team_id == team.id,
+            Invoice.status == 'paid'
+        ).group_by(Client.id, Client.name, Invoice.currency).order_by(paid_total.desc()).limit(limit).all()
+        result['top_clients'] = [
+            {'client_id': client_id, 'name': name, 'currency': currency, 'paid_amount': float(amount), 'paid_invoices': count}
+            for client_id, name, currency, amount, count in top
+        ]
+    return jsonify(result)
 
 @dashboard_bp.route('/monthly-revenue', methods=['GET'])
+@conditional_get
 def monthly_revenue():
     user, team = get_current_user_and_team()
     year = datetime.utcnow().year
-    # Group by month, sum paid invoices
+    # Paid revenue per month, read from the rollup table
     monthly = db.session.query(
-        extract('month', Invoice.created_at).label('month'),
-        func.sum(Invoice.amount)
+        TeamMonthlyRevenue.month,
+        func.sum(TeamMonthlyRevenue.paid_amount)
     ).filter(
-        Invoice.team_id == team.id,
-        Invoice.status == 'paid',
-        extract('year', Invoice.created_at) == year
-    ).group_by('month').order_by('month').all()
+        TeamMonthlyRevenue.team_id == team.id,
+        TeamMonthlyRevenue.year == year,
+        TeamMonthlyRevenue.paid_count > 0
+    ).group_by(TeamMonthlyRevenue.month).order_by(TeamMonthlyRevenue.month).all()
     # Format as {month: revenue}
     result = {int(month): float(amount) for month, amount in monthly}
     return jsonify(result)
 
-# Endpoints to be implemented 
\ No newline at end of file
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+MAX_BUCKETS = 1000
+
+def _bucket_start(day, granularity):
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+
+def _next_bucket(start, granularity):
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    months = 1 if granularity == 'month' else 3
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1)
+
+def _parse_day(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be a YYYY-MM-DD date')
+
+@dashboard_bp.route('/revenue', methods=['GET'])
+@conditional_get
+def revenue_series():
+    """Invoice totals per period between from and to (inclusive), split by currency and status"""
+    user, team = get_current_user_and_team()
+    today = datetime.utcnow().date()
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        abort(400, f'granularity must be one of {", ".join(GRANULARITIES)}')
+    start = _parse_day('from', date(today.year, 1, 1))
+    end = _parse_day('to', today)
+    if end < start:
+        abort(400, '"to" must not be before "from"')
+    status_filter = request.args.get('status')
+
+    buckets = []
+    cursor = _bucket_start(start, granularity)
+    while cursor <= end:
+        buckets.append(cursor)
+        cursor = _next_bucket(cursor, granularity)
+        if len(buckets) > MAX_BUCKETS:
+            abort(400, 'Range too large for this granularity')
+
+    # Group per day in SQL on a plain range predicate, then fold days into coarser buckets
+    day = func.date(Invoice.created_at).label('day')
+    status = Invoice.current_status.label('status')
+    query = db.session.query(
+        day, func.coalesce(Invoice.currency, 'MAD'), status,
+        func.count(Invoice.id), func.coalesce(func.sum(Invoice.amount), 0)
+    ).filter(
+        Invoice.team_id == team.id,
+        Invoice.created_at >= datetime.combine(start, datetime.min.time()),
+        Invoice.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time())
+    )
+    if status_filter:
+        query = query.filter(Invoice.current_status_is(status_filter))
+    rows = query.group_by(day, func.coalesce(Invoice.currency, 'MAD'), status).all()
+
+    index = {bucket: i for i, bucket in enumerate(buckets)}
+    series = {}
+    for row_day, currency, row_status, count, amount in rows:
+        if isinstance(row_day, str):
+            row_day = date.fromisoformat(row_day)
+        elif isinstance(row_day, datetime):
+            row_day = row_day.date()
+        entry = series.setdefault((currency, row_status), {
+            'currency': currency,
+            'status': row_status,
+            'amounts': [0.0] * len(buckets),
+            'counts': [0] * len(buckets)
+        })
+        i = index[_bucket_start(row_day, granularity)]
+        entry['amounts'][i] += float(amount)
+        entry['counts'][i] += count
+
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'buckets': [bucket.isoformat() for bucket in buckets],
+        'series': [series[key] for key in sorted(series)]
+    })
+ 
\ No newline at end of file
@@ -0,0 +1,47 @@
+from flask import Blueprint, Response, abort
+from utils.team_context import get_current_user_and_team
+from utils.events import broker
+import json
+import os
+import time
+
+events_bp = Blueprint('events', __name__)
+
+# Comment lines sent on an idle stream, so proxies keep it open and dead clients are noticed
+EVENT_HEARTBEAT_SECONDS = float(os.getenv('EVENT_HEARTBEAT_SECONDS', '20'))
+# Streams are closed after this long; clients reconnect, re-authenticating with a fresh token
+EVENT_STREAM_MAX_SECONDS = float(os.getenv('EVENT_STREAM_MAX_SECONDS', '3600'))
+RECONNECT_DELAY_MS = 3000
+
+def _format(event):
+    lines = []
+    if 'version' in event:
+        lines.append(f"id: {event['version']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+@events_bp.route('/', methods=['GET'])
+def stream_events():
+    """Server-sent events for the team: "change" after each committed write, "reset" when
+    events were dropped. Events only say what changed; clients fetch it with /api/sync."""
+    user, team = get_current_user_and_team()
+    subscription = broker.subscribe(team.id)
+    if subscription is None:
+        abort(503, 'Too many open event streams')
+
+    def stream():
+        # The database session is released when the view returns; nothing below touches it
+        yield f'retry: {RECONNECT_DELAY_MS}\n: connected\n\n'
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+            yield _format(event) if event else ': heartbeat\n\n'
+
+    response = Response(stream(), mimetype='text/event-stream')
+    # Runs when the server closes the response: stream finished, client gone or write failed
+    response.call_on_close(subscription.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
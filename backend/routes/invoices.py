@@ -1,88 +1,113 @@
 from flask import Blueprint, request, jsonify, abort, send_file
-from utils.firebase_auth import verify_firebase_token
+from utils.team_context import get_current_user_and_team
 from models.invoice import Invoice
 from models.invoice_item import InvoiceItem
 from models.client import Client
-from models.team import Team
-from models.teammembership import TeamMembership
-from models.user import User
 from database import db
-from datetime import datetime
-from utils.pdf import render_invoice_pdf
-import io
-import os
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, and_, or_, update
+from sqlalchemy.orm import selectinload
+from utils.pdf import invoice_pdf_payload, render_invoice_payload, render_invoices_pdf, team_logo_path
+from utils.pdf_cache import pdf_cache, pdf_fingerprint
+from utils.imports import request_records, import_invoices
+from utils.invoice_numbers import next_invoice_number
+from utils.invoice_items import item_rows, insert_items, replace_items
+from utils.search import invalidate_search, update_search
+from utils.rollups import invoice_snapshot, apply_invoice_change, apply_invoice_changes
+from utils.pagination import encode_cursor, decode_cursor, get_page_size, paginated_response
+from utils.conditional import conditional_get
+from utils.changes import record_changes
+from types import SimpleNamespace
+import tempfile
 
 invoices_bp = Blueprint('invoices', __name__)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+def _parse_date_arg(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.combine(date.fromisoformat(value), datetime.min.time())
+    except (TypeError, ValueError):
+        abort(400, f'{name} must be a YYYY-MM-DD date')
 
-def generate_invoice_number(team_id):
-    last_invoice = Invoice.query.filter_by(team_id=team_id).order_by(Invoice.id.desc()).first()
-    if last_invoice:
-        last_number = int(last_invoice.number)
-        return str(last_number + 1)
-    else:
-        return '1'
+def _parse_number_arg(args, name, kind):
+    try:
+        return kind(args[name])
+    except (TypeError, ValueError):
+        abort(400, f'{name} must be a number')
+
+def filter_invoices(query, args):
+    """Apply the list filters (status, client_id, date_from, date_to, min_amount, max_amount) in SQL"""
+    if args.get('status'):
+        query = query.filter(Invoice.current_status_is(args['status']))
+    if args.get('client_id'):
+        query = query.filter(Invoice.client_id == _parse_number_arg(args, 'client_id', int))
+    date_from = _parse_date_arg(args, 'date_from')
+    if date_from:
+        query = query.filter(Invoice.created_at >= date_from)
+    date_to = _parse_date_arg(args, 'date_to')
+    if date_to:
+        query = query.filter(Invoice.created_at < date_to + timedelta(days=1))
+    if args.get('min_amount') not in (None, ''):
+        query = query.filter(Invoice.amount >= _parse_number_arg(args, 'min_amount', float))
+    if args.get('max_amount') not in (None, ''):
+        query = query.filter(Invoice.amount <= _parse_number_arg(args, 'max_amount', float))
+    return query
+
+def invoice_list_query(team_id):
+    """The invoice list columns, with each invoice's item count; shared with /api/sync"""
+    items_count = db.session.query(func.count(InvoiceItem.id)).filter(
+        InvoiceItem.invoice_id == Invoice.id
+    ).scalar_subquery()
+    return db.session.query(
+        Invoice.id, Invoice.number, Invoice.client_id, Invoice.current_status.label('status'), Invoice.amount,
+        Invoice.currency, Invoice.due_date, Invoice.created_at, items_count.label('items_count')
+    ).filter(Invoice.team_id == team_id)
+
+def invoice_list_item(inv):
+    return {
+        'id': inv.id,
+        'number': inv.number,
+        'client_id': inv.client_id,
+        'status': inv.status,
+        'amount': inv.amount,
+        'currency': inv.currency,
+        'due_date': inv.due_date.isoformat() if inv.due_date else None,
+        'created_at': inv.created_at.isoformat() if inv.created_at else None,
+        'items_count': inv.items_count
+    }
 
 @invoices_bp.route('/', methods=['GET'])
+@conditional_get
 def list_invoices():
     user, team = get_current_user_and_team()
-    status_filter = request.args.get('status')
-    now = datetime.utcnow().date()
-    invoices = Invoice.query.filter_by(team_id=team.id).all()
-    result = []
-    for inv in invoices:
-        # Auto-calculate overdue
-        if inv.status == 'unpaid' and inv.due_date and inv.due_date < now:
-            inv.status = 'overdue'
-            db.session.commit()
-        if status_filter and inv.status != status_filter:
-            continue
-        
-        # Include items count
-        items_count = len(inv.items) if inv.items else 0
-        
-        result.append({
-            'id': inv.id,
-            'number': inv.number,
-            'client_id': inv.client_id,
-            'status': inv.status,
-            'amount': inv.amount,
-            'currency': inv.currency,
-            'due_date': inv.due_date.isoformat() if inv.due_date else None,
-            'created_at': inv.created_at.isoformat() if inv.created_at else None,
-            'items_count': items_count
-        })
-    return jsonify(result)
+    query = invoice_list_query(team.id)
+
+    # Filters are applied in SQL so the page size, not the team size, bounds the work
+    query = filter_invoices(query, request.args)
+
+    # Keyset pagination on (created_at, id), newest first
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            cursor_created_at, cursor_id = datetime.fromisoformat(values[0]), int(values[1])
+        except (IndexError, TypeError, ValueError):
+            abort(400, 'Invalid cursor')
+        query = query.filter(or_(
+            Invoice.created_at < cursor_created_at,
+            and_(Invoice.created_at == cursor_created_at, Invoice.id < cursor_id)
+        ))
+
+    limit = get_page_size()
+    rows = query.order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return paginated_response([invoice_list_item(inv) for inv in rows], next_cursor)
 
 @invoices_bp.route('/', methods=['POST'])
 def create_invoice():
@@ -93,11 +118,10 @@ def create_invoice():
     if not client:
         abort(400, 'Client not found or not in your team')
     
-    number = generate_invoice_number(team.id)
+    number = next_invoice_number(team)
     
     # Calculate total amount from items
-    items_data = data.get('items', [])
-    total_amount = 0
+    item_data_rows, total_amount = item_rows(data.get('items', []))
     
     # Create invoice first
     invoice = Invoice(
@@ -105,36 +129,32 @@ def create_invoice():
         client_id=client.id,
         number=number,
         status=data.get('status', 'unpaid'),
-        amount=0,  # Will be calculated from items
+        amount=total_amount,
         currency=data.get('currency', 'MAD'),
         due_date=datetime.fromisoformat(data['due_date']) if data.get('due_date') else None
     )
     db.session.add(invoice)
     db.session.flush()  # Get the invoice ID
     
-    # Add invoice items
-    for item_data in items_data:
-        quantity = float(item_data.get('quantity', 1))
-        unit_price = float(item_data.get('unit_price', 0))
-        total = quantity * unit_price
-        total_amount += total
-        
-        item = InvoiceItem(
-            invoice_id=invoice.id,
-            description=item_data.get('description', ''),
-            quantity=quantity,
-            unit_price=unit_price,
-            total=total
-        )
-        db.session.add(item)
-    
-    # Update invoice amount
-    invoice.amount = total_amount
+    # Add invoice items in one round trip
+    insert_items(invoice.id, item_data_rows)
+    apply_invoice_change(team.id, None, invoice_snapshot(invoice))
+    record_changes(team.id, 'invoice', [invoice.id])
     db.session.commit()
+    update_search(team.id, 'invoice', [invoice.id])
     
     return jsonify({'id': invoice.id, 'number': invoice.number}), 201
 
+@invoices_bp.route('/import', methods=['POST'])
+def import_invoices_route():
+    """Bulk create invoices with items from a CSV or JSON-lines upload; returns a per-row error report"""
+    user, team = get_current_user_and_team()
+    report = import_invoices(team, request_records())
+    invalidate_search(team.id)
+    return jsonify(report.to_dict())
+
 @invoices_bp.route('/<int:invoice_id>', methods=['GET'])
+@conditional_get
 def get_invoice(invoice_id):
     user, team = get_current_user_and_team()
     invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
@@ -156,7 +176,7 @@ def get_invoice(invoice_id):
         'id': invoice.id,
         'number': invoice.number,
         'client_id': invoice.client_id,
-        'status': invoice.status,
+        'status': invoice.current_status,
         'amount': invoice.amount,
         'currency': invoice.currency,
         'due_date': invoice.due_date.isoformat() if invoice.due_date else None,
@@ -167,11 +187,13 @@ def get_invoice(invoice_id):
 @invoices_bp.route('/<int:invoice_id>', methods=['PUT'])
 def update_invoice(invoice_id):
     user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
+    # Locked, so a concurrent write can't apply its rollup delta from the same before state
+    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).with_for_update().first()
     if not invoice:
         abort(404, 'Invoice not found')
     
     data = request.json
+    before = invoice_snapshot(invoice)
     
     # Update basic invoice info
     if 'client_id' in data:
@@ -187,43 +209,35 @@ def update_invoice(invoice_id):
     
     # Update items if provided
     if 'items' in data:
-        # Delete existing items
-        InvoiceItem.query.filter_by(invoice_id=invoice.id).delete()
-        
-        # Add new items
-        total_amount = 0
-        for item_data in data['items']:
-            quantity = float(item_data.get('quantity', 1))
-            unit_price = float(item_data.get('unit_price', 0))
-            total = quantity * unit_price
-            total_amount += total
-            
-            item = InvoiceItem(
-                invoice_id=invoice.id,
-                description=item_data.get('description', ''),
-                quantity=quantity,
-                unit_price=unit_price,
-                total=total
-            )
-            db.session.add(item)
-        
-        # Update invoice amount
+        # Only lines that differ from what is stored are written
+        item_data_rows, total_amount = item_rows(data['items'])
+        replace_items(invoice, item_data_rows)
         invoice.amount = total_amount
     
+    apply_invoice_change(team.id, before, invoice_snapshot(invoice))
+    record_changes(team.id, 'invoice', [invoice.id])
     db.session.commit()
+    pdf_cache.invalidate_invoice(team.id, invoice.id)
+    if 'items' in data:
+        update_search(team.id, 'invoice', [invoice.id])
     return jsonify({'success': True})
 
 @invoices_bp.route('/<int:invoice_id>', methods=['DELETE'])
 def delete_invoice(invoice_id):
     user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
+    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).with_for_update().first()
     if not invoice:
         abort(404, 'Invoice not found')
+    apply_invoice_change(team.id, invoice_snapshot(invoice), None)
     db.session.delete(invoice)
+    record_changes(team.id, 'invoice', [invoice_id], deleted=True)
     db.session.commit()
+    pdf_cache.invalidate_invoice(team.id, invoice_id)
+    update_search(team.id, 'invoice', [invoice_id], deleted=True)
     return jsonify({'success': True})
 
 @invoices_bp.route('/<int:invoice_id>/pdf', methods=['GET'])
+@conditional_get
 def download_invoice_pdf(invoice_id):
     user, team = get_current_user_and_team()
     invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
@@ -233,34 +247,147 @@ def download_invoice_pdf(invoice_id):
     if not client:
         abort(404, 'Client not found')
     
-    # Convert logo URL to file path if it exists
-    logo_path = None
-    if team.logo_url:
-        # Extract filename from URL like '/api/teams/logo/team_1_logo_filename.png'
-        filename = team.logo_url.split('/')[-1]
-        logo_path = os.path.join(os.path.dirname(__file__), '..', 'uploads', filename)
-        # Check if file actually exists
-        if not os.path.exists(logo_path):
-            logo_path = None
+    logo_path = team_logo_path(team)
+    payload = invoice_pdf_payload(invoice, client, team)
+    fingerprint = pdf_fingerprint(payload, logo_path)
     
-    pdf_bytes = render_invoice_pdf(invoice, client, team, logo_url=logo_path)
+    download_name = f'invoice_{invoice.number}.pdf'
+    path = pdf_cache.get(team.id, invoice.id, fingerprint)
+    if path is None:
+        path = pdf_cache.write(team.id, invoice.id, fingerprint,
+                               lambda f: render_invoice_payload(payload, logo_url=logo_path, out=f))
+        if path is None:
+            # Cache unavailable; serve from a temp file
+            return send_file(_render_to_tempfile(lambda f: render_invoice_payload(payload, logo_url=logo_path, out=f)),
+                             mimetype='application/pdf', as_attachment=True, download_name=download_name)
+    return send_file(
+        path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=download_name
+    )
+
+MAX_BATCH_PDF_INVOICES = 500
+
+def _render_to_tempfile(render):
+    """Anonymous temp file holding render(f)'s output, rewound for send_file; deleted once closed"""
+    f = tempfile.TemporaryFile()
+    try:
+        render(f)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+@invoices_bp.route('/pdf', methods=['POST'])
+def download_invoices_pdf():
+    """One merged PDF for a list of invoice ids or for the list filters"""
+    user, team = get_current_user_and_team()
+    data = request.json or {}
+    query = Invoice.query.options(selectinload(Invoice.items)).filter(Invoice.team_id == team.id)
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            abort(400, 'ids must be a list of invoice ids')
+        query = query.filter(Invoice.id.in_(ids))
+    else:
+        query = filter_invoices(query, data)
+    invoices = query.order_by(Invoice.created_at, Invoice.id).limit(MAX_BATCH_PDF_INVOICES + 1).all()
+    if not invoices:
+        abort(404, 'No matching invoices')
+    if len(invoices) > MAX_BATCH_PDF_INVOICES:
+        abort(400, f'At most {MAX_BATCH_PDF_INVOICES} invoices per document; narrow the filter')
+
+    client_ids = {inv.client_id for inv in invoices}
+    clients = {c.id: c for c in Client.query.filter(Client.team_id == team.id, Client.id.in_(client_ids))}
+    payloads = (invoice_pdf_payload(inv, clients.get(inv.client_id), team) for inv in invoices)
+    logo_path = team_logo_path(team)
     return send_file(
-        io.BytesIO(pdf_bytes),
+        _render_to_tempfile(lambda f: render_invoices_pdf(payloads, logo_url=logo_path, out=f)),
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'invoice_{invoice.number}.pdf'
+        download_name='invoices.pdf'
     )
 
 @invoices_bp.route('/<int:invoice_id>/status', methods=['PATCH'])
 def update_invoice_status(invoice_id):
     user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
+    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).with_for_update().first()
     if not invoice:
         abort(404, 'Invoice not found')
     data = request.json
     status = data.get('status')
     if status not in ['paid', 'unpaid']:
         abort(400, 'Status must be "paid" or "unpaid"')
+    before = invoice_snapshot(invoice)
     invoice.status = status
+    apply_invoice_change(team.id, before, invoice_snapshot(invoice))
+    record_changes(team.id, 'invoice', [invoice.id])
+    db.session.commit()
+    pdf_cache.invalidate_invoice(team.id, invoice.id)
+    return jsonify({'success': True, 'status': invoice.current_status})
+
+MAX_BULK_STATUS_INVOICES = 5000
+
+@invoices_bp.route('/status', methods=['PATCH'])
+def bulk_update_invoice_status():
+    """Set the status of many invoices in one UPDATE.
+
+    Takes {"status": ..., "ids": [...]} or {"status": ..., "filter": {...}} with the list filters.
+    """
+    user, team = get_current_user_and_team()
+    data = request.json or {}
+    status = data.get('status')
+    if status not in ['paid', 'unpaid']:
+        abort(400, 'Status must be "paid" or "unpaid"')
+    ids = data.get('ids')
+    query = db.session.query(
+        Invoice.id, Invoice.status, Invoice.currency, Invoice.amount, Invoice.created_at, Invoice.due_date
+    ).filter(Invoice.team_id == team.id)
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            abort(400, 'ids must be a list of invoice ids')
+        if len(ids) > MAX_BULK_STATUS_INVOICES:
+            abort(400, f'At most {MAX_BULK_STATUS_INVOICES} invoices per request')
+        query = query.filter(Invoice.id.in_(ids))
+    elif isinstance(data.get('filter'), dict):
+        query = filter_invoices(query, data['filter'])
+    else:
+        abort(400, 'Provide ids or a filter object')
+    # Row locks keep the rollup deltas below in step with the rows actually updated
+    rows = query.order_by(Invoice.id).limit(MAX_BULK_STATUS_INVOICES + 1).with_for_update().all()
+    if len(rows) > MAX_BULK_STATUS_INVOICES:
+        abort(400, f'At most {MAX_BULK_STATUS_INVOICES} invoices per request; narrow the filter')
+
+    changed = [row for row in rows if row.status != status]
+    if changed:
+        db.session.execute(
+            update(Invoice)
+            .where(Invoice.team_id == team.id, Invoice.id.in_([row.id for row in changed]))
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        apply_invoice_changes(team.id, [
+            (invoice_snapshot(row), invoice_snapshot(SimpleNamespace(**dict(row._mapping, status=status))))
+            for row in changed
+        ])
+    team_id = team.id
+    if changed:
+        record_changes(team_id, 'invoice', [row.id for row in changed])
     db.session.commit()
-    return jsonify({'success': True, 'status': invoice.status}) 
\ No newline at end of file
+    for row in changed:
+        pdf_cache.invalidate_invoice(team_id, row.id)
+
+    today = datetime.utcnow().date()
+    changed_ids = {row.id for row in changed}
+    results = [{
+        'id': row.id,
+        'result': 'updated' if row.id in changed_ids else 'unchanged',
+        'status': 'overdue' if status == 'unpaid' and row.due_date and row.due_date < today else status
+    } for row in rows]
+    if ids is not None:
+        found = {row.id for row in rows}
+        results += [{'id': i, 'result': 'not_found'} for i in dict.fromkeys(ids) if i not in found]
+    return jsonify({'success': True, 'updated': len(changed), 'results': results})
+
@@ -0,0 +1,54 @@
+from flask import Blueprint, request, jsonify, abort, send_file, current_app
+from utils.team_context import get_current_user_and_team
+from utils.jobs import JOB_KINDS, submit_job, job_to_dict
+from models.job import Job
+from models.invoice import Invoice
+import os
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/', methods=['POST'])
+def create_job():
+    user, team = get_current_user_and_team()
+    data = request.json or {}
+    kind = data.get('kind')
+    if kind not in JOB_KINDS:
+        abort(400, f'kind must be one of {", ".join(JOB_KINDS)}')
+    params = {}
+    if kind == 'invoices_csv':
+        params['items'] = bool(data.get('items'))
+    if kind == 'invoice_pdf':
+        invoice = Invoice.query.filter_by(id=data.get('invoice_id'), team_id=team.id).first()
+        if not invoice:
+            abort(404, 'Invoice not found')
+        params['invoice_id'] = invoice.id
+    job = submit_job(current_app._get_current_object(), team.id, user.id, kind, params)
+    response = jsonify(job_to_dict(job))
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response, 202
+
+@jobs_bp.route('/', methods=['GET'])
+def list_jobs():
+    user, team = get_current_user_and_team()
+    jobs = Job.query.filter_by(team_id=team.id).order_by(Job.created_at.desc()).limit(20).all()
+    return jsonify([job_to_dict(job) for job in jobs])
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    user, team = get_current_user_and_team()
+    job = Job.query.filter_by(id=job_id, team_id=team.id).first()
+    if not job:
+        abort(404, 'Job not found')
+    return jsonify(job_to_dict(job))
+
+@jobs_bp.route('/<job_id>/download', methods=['GET'])
+def download_job_artifact(job_id):
+    user, team = get_current_user_and_team()
+    job = Job.query.filter_by(id=job_id, team_id=team.id).first()
+    if not job:
+        abort(404, 'Job not found')
+    if job.status != 'done':
+        abort(409, f'Job is {job.status}')
+    if not job.artifact_path or not os.path.exists(job.artifact_path):
+        abort(410, 'Job artifact has expired')
+    return send_file(job.artifact_path, mimetype=job.mimetype, as_attachment=True, download_name=job.artifact_name)
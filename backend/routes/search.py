@@ -0,0 +1,36 @@
+from flask import Blueprint, request, abort
+from utils.team_context import get_current_user_and_team
+from utils.search import search
+from utils.pagination import encode_cursor, decode_cursor, get_page_size, paginated_response
+from utils.conditional import conditional_get
+
+search_bp = Blueprint('search', __name__)
+
+SEARCH_KINDS = {'all': ('client', 'invoice'), 'clients': ('client',), 'invoices': ('invoice',)}
+MAX_QUERY_LENGTH = 200
+
+@search_bp.route('/', methods=['GET'])
+@conditional_get
+def search_team():
+    """Ranked clients and invoices matching ?q=, paginated like the invoice list"""
+    user, team = get_current_user_and_team()
+    query = request.args.get('q', '').strip()
+    if not query:
+        abort(400, 'q is required')
+    if len(query) > MAX_QUERY_LENGTH:
+        abort(400, f'q must be at most {MAX_QUERY_LENGTH} characters')
+    kinds = SEARCH_KINDS.get(request.args.get('type', 'all'))
+    if kinds is None:
+        abort(400, 'type must be all, clients or invoices')
+    limit = get_page_size()
+
+    offset = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+            abort(400, 'Invalid cursor')
+        offset = values[0]
+
+    results, has_more = search(team.id, query, kinds, offset, limit)
+    return paginated_response(results, encode_cursor(offset + limit) if has_more else None)
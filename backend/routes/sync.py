@@ -0,0 +1,98 @@
+from flask import Blueprint, request, jsonify, abort
+from utils.team_context import get_current_user_and_team, invalidate_team
+from utils.conditional import conditional_get
+from utils.pagination import encode_cursor, decode_cursor
+from models.team import Team
+from models.team_change import TeamChange
+from models.client import Client
+from models.invoice import Invoice
+from routes.clients import client_list_query, client_list_item
+from routes.invoices import invoice_list_query, invoice_list_item
+from routes.teams import team_payload
+from database import db
+from datetime import datetime, date
+
+sync_bp = Blueprint('sync', __name__)
+
+# Beyond this many changed entities a full reload is cheaper than a delta
+MAX_SYNC_CHANGES = 1000
+
+def _parse_since(token):
+    """The (data version, UTC day) held by a version token from a previous sync"""
+    values = decode_cursor(token)
+    try:
+        version, day = values
+        if not isinstance(version, int) or version < 0:
+            raise ValueError
+        return version, date.fromisoformat(day)
+    except (TypeError, ValueError):
+        abort(400, 'Invalid since version')
+
+@sync_bp.route('/', methods=['GET'])
+@conditional_get
+def sync_changes():
+    """Clients, invoices and team settings changed since ?since=, plus ids deleted since.
+
+    Without since, or when the delta would be too large, answers {"reset": true}: reload the
+    lists, then sync from the returned version. Entities may be sent again by the next sync;
+    applying a response is idempotent.
+    """
+    user, team = get_current_user_and_team()
+    today = datetime.utcnow().date()
+    current = db.session.query(Team.data_version).filter(Team.id == team.id).scalar()
+    # Versions commit in order (see bump_team_version), so every change up to current is visible
+    version = encode_cursor(current, today)
+    since = request.args.get('since')
+    if not since:
+        return jsonify({'version': version, 'reset': True})
+    since_version, since_day = _parse_since(since)
+    if since_version > current or since_day > today:
+        # Not a version of this database
+        return jsonify({'version': version, 'reset': True})
+
+    changes = db.session.query(TeamChange.kind, TeamChange.entity_id, TeamChange.deleted).filter(
+        TeamChange.team_id == team.id, TeamChange.version > since_version, TeamChange.version <= current
+    ).limit(MAX_SYNC_CHANGES + 1).all()
+    lapsed = []
+    if since_day < today:
+        # Unpaid invoices that fell due since then now read as overdue, without any write.
+        # The overdue sweep may already have stored them as 'overdue'; it records no change
+        lapsed = db.session.query(Invoice.id).filter(
+            Invoice.team_id == team.id, Invoice.status.in_(('unpaid', 'overdue')),
+            Invoice.due_date >= since_day, Invoice.due_date < today
+        ).limit(MAX_SYNC_CHANGES + 1).all()
+    if len(changes) + len(lapsed) > MAX_SYNC_CHANGES:
+        return jsonify({'version': version, 'reset': True})
+
+    changed = {'client': set(), 'invoice': {invoice_id for (invoice_id,) in lapsed}, 'team': set()}
+    deleted = {'client': set(), 'invoice': set()}
+    for kind, entity_id, is_deleted in changes:
+        (deleted if is_deleted else changed)[kind].add(entity_id)
+    changed['invoice'] -= deleted['invoice']
+
+    clients = []
+    if changed['client']:
+        clients = [client_list_item(c) for c in client_list_query(team.id).filter(
+            Client.id.in_(changed['client'])).order_by(Client.id)]
+    invoices = []
+    if changed['invoice']:
+        invoices = [invoice_list_item(inv) for inv in invoice_list_query(team.id).filter(
+            Invoice.id.in_(changed['invoice'])).order_by(Invoice.created_at.desc(), Invoice.id.desc())]
+    # Rows gone by now were deleted after current; the next sync reports them as well
+    deleted['client'] |= changed['client'] - {c['id'] for c in clients}
+    deleted['invoice'] |= changed['invoice'] - {inv['id'] for inv in invoices}
+
+    team_settings = None
+    if changed['team']:
+        # This process may still cache the old settings and members
+        invalidate_team(team.id)
+        team_settings = team_payload(db.session.get(Team, team.id, populate_existing=True))
+
+    return jsonify({
+        'version': version,
+        'reset': False,
+        'clients': clients,
+        'invoices': invoices,
+        'team': team_settings,
+        'deleted': {'clients': sorted(deleted['client']), 'invoices': sorted(deleted['invoice'])}
+    })
@@ -1,55 +1,29 @@
 from flask import Blueprint, request, jsonify, abort, send_from_directory
 from utils.firebase_auth import verify_firebase_token
+from utils.team_context import get_current_user_and_team, get_team_members, invalidate_team, invalidate_user
 from models.team import Team
 from models.teammembership import TeamMembership
 from models.user import User
+from models.team_stats import TeamStats, TeamMonthlyRevenue
+from models.invoice_sequence import InvoiceSequence
+from models.team_change import TeamChange
+from utils.pdf_cache import pdf_cache
+from utils.search import invalidate_search
+from utils.invoice_numbers import team_number_format, validate_number_format, reseed_sequence
+from utils.conditional import conditional_get
+from utils.changes import record_changes
+from utils.jobs import delete_team_jobs
 from database import db
+from sqlalchemy import and_
 import os
 
 teams_bp = Blueprint('teams', __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
-
-@teams_bp.route('/me', methods=['GET'])
-def get_team_info():
-    user, team = get_current_user_and_team()
-    members = TeamMembership.query.filter_by(team_id=team.id).all()
-    member_list = []
-    for m in members:
-        u = User.query.get(m.user_id)
-        member_list.append({'id': u.id, 'email': u.email, 'name': u.name, 'role': m.role})
-    return jsonify({
+def team_payload(team):
+    """Team settings and members as returned by /me; shared with /api/sync"""
+    return {
         'id': team.id,
         'name': team.name,
         'logo_url': team.logo_url,
@@ -60,8 +34,15 @@ def get_team_info():
         'address': team.address,
         'phone': team.phone,
         'email': team.email,
-        'members': member_list
-    })
+        'invoice_number_format': team_number_format(team),
+        'members': get_team_members(team.id, team.data_version)
+    }
+
+@teams_bp.route('/me', methods=['GET'])
+@conditional_get
+def get_team_info():
+    user, team = get_current_user_and_team()
+    return jsonify(team_payload(team))
 
 @teams_bp.route('/invite', methods=['POST'])
 def invite_member():
@@ -79,7 +60,9 @@ def invite_member():
         abort(400, 'User already a member')
     membership = TeamMembership(user_id=invitee.id, team_id=team.id, role='member')
     db.session.add(membership)
+    record_changes(team.id, 'team', [team.id])
     db.session.commit()
+    invalidate_team(team.id)
     return jsonify({'success': True})
 
 @teams_bp.route('/remove', methods=['POST'])
@@ -93,7 +76,9 @@ def remove_member():
     if not membership:
         abort(404, 'Membership not found')
     db.session.delete(membership)
+    record_changes(team.id, 'team', [team.id])
     db.session.commit()
+    invalidate_team(team.id)
     return jsonify({'success': True})
 
 @teams_bp.route('/update', methods=['POST'])
@@ -116,7 +101,20 @@ def update_team():
         team.phone = data['phone']
     if 'email' in data:
         team.email = data['email']
+    if 'invoice_number_format' in data:
+        number_format = data['invoice_number_format'] or None
+        if number_format:
+            try:
+                validate_number_format(number_format)
+            except ValueError as e:
+                abort(400, str(e))
+        if number_format != team.invoice_number_format:
+            team.invoice_number_format = number_format
+            reseed_sequence(team)
+    record_changes(team.id, 'team', [team.id])
     db.session.commit()
+    invalidate_team(team.id)
+    pdf_cache.invalidate_team(team.id)
     return jsonify({
         'success': True, 
         'name': team.name,
@@ -126,7 +124,8 @@ def update_team():
         'professional_tax_number': team.professional_tax_number,
         'address': team.address,
         'phone': team.phone,
-        'email': team.email
+        'email': team.email,
+        'invoice_number_format': team_number_format(team)
     })
 
 @teams_bp.route('/logo', methods=['POST'])
@@ -139,7 +138,10 @@ def upload_logo():
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     file.save(filepath)
     team.logo_url = f'/api/teams/logo/{filename}'
+    record_changes(team.id, 'team', [team.id])
     db.session.commit()
+    invalidate_team(team.id)
+    pdf_cache.invalidate_team(team.id)
     return jsonify({'success': True, 'logo_url': team.logo_url})
 
 @teams_bp.route('/logo/<filename>', methods=['GET'])
@@ -149,30 +151,36 @@ def get_logo(filename):
 @teams_bp.route('/list', methods=['GET'])
 def list_teams():
     user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
+    rows = db.session.query(User.id, Team.id, Team.name, Team.logo_url).outerjoin(
+        TeamMembership, TeamMembership.user_id == User.id
+    ).outerjoin(
+        Team, Team.id == TeamMembership.team_id
+    ).filter(User.firebase_uid == user_info['uid']).order_by(TeamMembership.id).all()
+    if not rows:
         abort(401, 'User not found')
-    memberships = TeamMembership.query.filter_by(user_id=user.id).all()
-    teams = []
-    for m in memberships:
-        t = Team.query.get(m.team_id)
-        teams.append({'id': t.id, 'name': t.name, 'logo_url': t.logo_url})
-    return jsonify(teams)
+    return jsonify([
+        {'id': team_id, 'name': name, 'logo_url': logo_url}
+        for _, team_id, name, logo_url in rows if team_id is not None
+    ])
 
 @teams_bp.route('/switch', methods=['POST'])
 def switch_team():
     user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        abort(401, 'User not found')
     data = request.json
     team_id = data.get('team_id')
-    membership = TeamMembership.query.filter_by(user_id=user.id, team_id=team_id).first()
+    # The user and their membership of the target team in one query
+    row = db.session.query(User, TeamMembership.id).outerjoin(
+        TeamMembership, and_(TeamMembership.user_id == User.id, TeamMembership.team_id == team_id)
+    ).filter(User.firebase_uid == user_info['uid']).first()
+    if not row:
+        abort(401, 'User not found')
+    user, membership = row
     if not membership:
         abort(403, 'Not a member of this team')
     # For demo: store active team in language_preference (should use session or dedicated field)
     user.language_preference = f'active_team:{team_id}'
     db.session.commit()
+    invalidate_user(user.firebase_uid)
     return jsonify({'success': True, 'active_team_id': team_id})
 
 @teams_bp.route('/delete', methods=['POST'])
@@ -188,11 +196,19 @@ def delete_team():
         abort(404, 'Team not found')
     if team.owner_id != user.id:
         abort(403, 'Only the team owner can delete the team')
-    # Delete memberships
+    # Delete memberships, rollups, the change log and background jobs
     TeamMembership.query.filter_by(team_id=team.id).delete()
+    TeamStats.query.filter_by(team_id=team.id).delete()
+    TeamMonthlyRevenue.query.filter_by(team_id=team.id).delete()
+    InvoiceSequence.query.filter_by(team_id=team.id).delete()
+    TeamChange.query.filter_by(team_id=team.id).delete()
+    delete_team_jobs(team.id)
     # Delete the team
     db.session.delete(team)
     db.session.commit()
+    invalidate_team(team.id)
+    pdf_cache.invalidate_team(team.id)
+    invalidate_search(team.id)
     return jsonify({'success': True})
 
 # Endpoints to be implemented 
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Time invoice PDF rendering with and without the per-process render caches.
+
+Usage (from backend/):
+    python scripts/bench_pdf.py                  # synthetic 2000x2000 logo
+    python scripts/bench_pdf.py --logo uploads/team_6_logo_dexscreener.png --runs 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image
+from utils.pdf import render_invoice_pdf, clear_render_caches
+
+
+def sample_invoice(lines):
+    items = [SimpleNamespace(description=f'Prestation {n}', quantity=2.0, unit_price=150.0, total=300.0)
+             for n in range(lines)]
+    invoice = SimpleNamespace(
+        number='1042', status='unpaid', current_status='unpaid', amount=300.0 * lines, currency='MAD',
+        due_date=(datetime.utcnow() + timedelta(days=30)).date(), created_at=datetime.utcnow(), items=items
+    )
+    client = SimpleNamespace(name='Client SARL', ice='001234567000089', if_number='12345678')
+    team = SimpleNamespace(name='Fatoora Demo', ice='009876543000021', if_number='87654321', cnie='AB123456',
+                           professional_tax_number='TP-778', address='12 Rue Exemple, Casablanca',
+                           phone='+212 600 000 000', email='contact@example.ma')
+    return invoice, client, team
+
+
+def time_runs(runs, render, cold):
+    start = time.perf_counter()
+    for _ in range(runs):
+        if cold:
+            clear_render_caches()
+        render()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--lines', type=int, default=10, help='invoice items per PDF')
+    parser.add_argument('--logo', help='logo file; defaults to a generated 2000x2000 PNG')
+    args = parser.parse_args()
+
+    logo = args.logo
+    if not logo:
+        logo = os.path.join(tempfile.mkdtemp(), 'logo.png')
+        Image.effect_mandelbrot((2000, 2000), (-2, -1.5, 1, 1.5), 100).convert('RGB').save(logo)
+
+    invoice, client, team = sample_invoice(args.lines)
+    render = lambda: render_invoice_pdf(invoice, client, team, logo_url=logo)
+    render()  # warm up imports and fonts
+
+    cold = time_runs(args.runs, render, cold=True)
+    warm = time_runs(args.runs, render, cold=False)
+    print(f'{args.runs} runs, {args.lines} lines, logo {logo}')
+    print(f'rebuild styles and decode logo per PDF: {cold:8.2f} ms/pdf')
+    print(f'shared render context:                  {warm:8.2f} ms/pdf')
+    print(f'speedup:                                {cold / warm:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Time /api/search queries against teams of growing size.
+
+Selective queries should take about the same time at every size: Postgres answers them from
+the pg_trgm indexes, other databases from the in-memory inverted index (built once per team,
+timed separately).
+
+Usage (from backend/):
+    python scripts/bench_search.py                       # throwaway SQLite file
+    python scripts/bench_search.py --database-url postgresql://... --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from sqlalchemy import insert
+from database import db
+from models.user import User
+from models.team import Team
+from models.client import Client
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from models import teammembership  # noqa: F401 (relationship target)
+from utils import search as search_module
+
+WORDS = ['conseil', 'transport', 'atlas', 'maroc', 'digital', 'services', 'import', 'export', 'agence', 'studio']
+QUERIES = ['client 4242', '00000000004242', 'inv-4242', 'prestation 4242', 'atlas maroc 42']
+
+
+def seed(team_id, size):
+    """size clients and size invoices (one item each) for a fresh team"""
+    db.session.execute(insert(User).values(id=team_id, firebase_uid=f'uid-{team_id}', email=f'u{team_id}@example.ma'))
+    db.session.execute(insert(Team).values(id=team_id, name=f'Team {team_id}', owner_id=team_id))
+    first = db.session.query(db.func.coalesce(db.func.max(Client.id), 0)).scalar() + 1
+    for start in range(0, size, 5000):
+        batch = range(start, min(start + 5000, size))
+        db.session.execute(insert(Client), [{
+            'id': first + n, 'team_id': team_id, 'phone': f'06{n:08d}', 'ice': f'{n:014d}', 'if_number': f'{n:08d}',
+            'name': f'Client {n} {WORDS[n % len(WORDS)]} {WORDS[(n // 10) % len(WORDS)]}',
+        } for n in batch])
+        ids = db.session.scalars(insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True), [{
+            'team_id': team_id, 'client_id': first + n, 'number': f'INV-{n}', 'status': 'unpaid',
+            'amount': 100.0, 'currency': 'MAD', 'created_at': datetime.utcnow(),
+        } for n in batch]).all()
+        db.session.execute(insert(InvoiceItem), [{
+            'invoice_id': invoice_id, 'description': f'Prestation {n} {WORDS[n % len(WORDS)]}',
+            'quantity': 1.0, 'unit_price': 100.0, 'total': 100.0,
+        } for invoice_id, n in zip(ids, batch)])
+    db.session.commit()
+
+
+def time_query(team_id, query, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        search_module.search(team_id, query, limit=20)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='clients and invoices per team')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'search.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for name, table, column in search_module.TRIGRAM_INDEXES:
+                db.session.execute(db.text(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (lower({column}) gin_trgm_ops)'))
+            db.session.commit()
+
+        backend = 'pg_trgm' if search_module._use_trigram() else 'in-memory index'
+        print(f'{db.engine.dialect.name} ({backend}), median of {args.runs} runs, ms\n')
+        print(f'{"size":>8}  {"index build":>11}  ' + '  '.join(f'{q!r:>18}' for q in QUERIES))
+        for team_id, size in enumerate(args.sizes, 1):
+            seed(team_id, size)
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(db.text('ANALYZE'))
+            start = time.perf_counter()
+            search_module.search(team_id, QUERIES[0], limit=20)  # builds the in-memory index if used
+            build = (time.perf_counter() - start) * 1000
+            timings = [time_query(team_id, query, args.runs) for query in QUERIES]
+            print(f'{size:>8}  {build:>11.1f}  ' + '  '.join(f'{t:>18.2f}' for t in timings))
+        db.session.rollback()
+        if not args.database_url:
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
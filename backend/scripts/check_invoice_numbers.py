@@ -0,0 +1,165 @@
+"""Create invoices from many threads at once and check the numbers are unique and gap-free.
+
+Some creates are rolled back on purpose; their numbers must be reused, not skipped. A last
+case switches the team's number format back and forth and checks no number is handed out twice.
+
+Usage (from backend/):
+    python scripts/check_invoice_numbers.py                      # throwaway SQLite file
+    python scripts/check_invoice_numbers.py --database-url postgresql://... --threads 16 --creates 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from sqlalchemy import insert
+from database import db
+from models.user import User
+from models.team import Team
+from models.client import Client
+from models.invoice import Invoice
+from models.invoice_sequence import InvoiceSequence
+from models import teammembership, invoice_item  # noqa: F401 (relationship targets)
+from utils.invoice_numbers import next_invoice_number, sequence_scope, reseed_sequence
+
+# (format, numbers already in use before the sequence exists, expected first new n)
+CASES = [
+    ('{n}', ['1', '2', '7'], 8),
+    ('FAC-{year}-{n:04d}', [f'FAC-{datetime.utcnow().year - 1}-0040', f'FAC-{datetime.utcnow().year}-0003'], 4),
+]
+
+
+def seed(number_format, existing):
+    db.session.execute(insert(User).values(id=1, firebase_uid='uid-1', email='user1@example.ma', name='User 1'))
+    db.session.execute(insert(Team).values(id=1, name='Team 1', owner_id=1, invoice_number_format=number_format))
+    db.session.execute(insert(Client).values(id=1, team_id=1, name='Client 1'))
+    if existing:
+        db.session.execute(insert(Invoice), [
+            {'team_id': 1, 'client_id': 1, 'number': number, 'status': 'unpaid', 'amount': 0} for number in existing
+        ])
+    db.session.commit()
+
+
+def create_invoices(app, creates, rollback_rate, committed, errors):
+    with app.app_context():
+        for _ in range(creates):
+            try:
+                team = db.session.get(Team, 1)
+                number = next_invoice_number(team)
+                db.session.add(Invoice(team_id=1, client_id=1, number=number, status='unpaid', amount=0))
+                db.session.flush()
+                if random.random() < rollback_rate:
+                    db.session.rollback()
+                    continue
+                db.session.commit()
+                committed.append(number)
+            except Exception as e:
+                db.session.rollback()
+                errors.append(repr(e))
+        db.session.remove()
+
+
+def run_case(app, number_format, existing, first_n, threads, creates, rollback_rate):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(number_format, existing)
+    committed, errors = [], []
+    workers = [
+        threading.Thread(target=create_invoices, args=(app, creates, rollback_rate, committed, errors))
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    year = datetime.utcnow().year
+    expected = [number_format.format(n=n, year=year) for n in range(first_n, first_n + len(committed))]
+    with app.app_context():
+        stored = {number for (number,) in db.session.query(Invoice.number).filter(Invoice.team_id == 1)}
+        sequence = db.session.get(InvoiceSequence, (1, sequence_scope(number_format, datetime.utcnow().date())))
+        last_value = sequence.last_value if sequence else None
+    problems = []
+    if errors:
+        problems.append(f'{len(errors)} failed creates, e.g. {errors[0]}')
+    if len(set(committed)) != len(committed):
+        problems.append('duplicate numbers')
+    if sorted(committed) != sorted(expected):
+        problems.append(f'numbers are not {expected[0]}..{expected[-1]} without gaps')
+    if not set(expected) <= stored:
+        problems.append('committed numbers missing from the database')
+    if last_value != first_n + len(committed) - 1:
+        problems.append(f'sequence is at {last_value}, expected {first_n + len(committed) - 1}')
+    print(f'{number_format!r}: {threads} threads, {len(committed)} committed, '
+          f'{threads * creates - len(committed) - len(errors)} rolled back: '
+          + ('; '.join(problems) if problems else 'ok'))
+    return not problems
+
+
+# Formats set one after another, each followed by one create, and the numbers expected
+ROUND_TRIP = [('FAC-{n}', 'FAC-1'), (None, '4'), ('FAC-{n}', 'FAC-5'), (None, '6')]
+
+
+def run_format_round_trip(app):
+    """'{n}' and 'FAC-{n}' share one counter; switching between them must not reuse numbers"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed('{n}', ['1', '2', '3'])
+        created, problems = [], []
+        for number_format, expected in ROUND_TRIP:
+            team = db.session.get(Team, 1)
+            team.invoice_number_format = number_format
+            reseed_sequence(team)
+            db.session.commit()
+            try:
+                number = next_invoice_number(team)
+                db.session.add(Invoice(team_id=1, client_id=1, number=number, status='unpaid', amount=0))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                problems.append(f'create after switching to {number_format!r} failed: {e!r}')
+                continue
+            created.append(number)
+            if number != expected:
+                problems.append(f'switching to {number_format!r} gave {number}, expected {expected}')
+        db.session.remove()
+    print(f'format round trip: {", ".join(created)}: ' + ('; '.join(problems) if problems else 'ok'))
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--creates', type=int, default=25, help='creates per thread')
+    parser.add_argument('--rollback-rate', type=float, default=0.2)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'numbers.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    if database_url.startswith('sqlite'):
+        # SQLite serialises writers on the database lock; wait for it rather than fail
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+
+    ok = all([
+        run_case(app, number_format, existing, first_n, args.threads, args.creates, args.rollback_rate)
+        for number_format, existing, first_n in CASES
+    ] + [run_format_round_trip(app)])
+    if not args.database_url:
+        with app.app_context():
+            db.drop_all()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
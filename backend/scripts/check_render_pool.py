@@ -0,0 +1,75 @@
+"""Kill PDF render pool children and check exports recover on a fresh pool.
+
+Covers a child dying between exports, one dying mid-export (its renders are resubmitted), and
+the pool breaking twice in one export (the export fails, the next one renders again).
+
+Usage (from backend/):
+    python scripts/check_render_pool.py --invoices 20
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from concurrent.futures.process import BrokenProcessPool
+from bench_pdf import sample_invoice
+from utils import render_pool
+
+
+def kill_child():
+    """SIGKILL one child of the shared pool, as the OOM killer would"""
+    executor = render_pool.get_executor()
+    # Children start on demand; make sure one is up
+    executor.submit(time.sleep, 0).result()
+    os.kill(next(iter(executor._processes)), signal.SIGKILL)
+    time.sleep(0.5)
+
+
+def entries(count, kill_after=()):
+    payload = sample_invoice(3)
+    for n in range(count):
+        if n in kill_after:
+            kill_child()
+        yield None, payload
+
+
+def export(count, kill_after=()):
+    """Rendered PDF count, or the error that ended the export"""
+    try:
+        results = list(render_pool.render_payloads(entries(count, kill_after)))
+    except BrokenProcessPool as e:
+        return e
+    if not all(pdf.startswith(b'%PDF') for _, pdf in results):
+        return 'a result is not a PDF'
+    return len(results)
+
+
+def check(name, result, expected):
+    ok = result == expected if not isinstance(expected, type) else isinstance(result, expected)
+    print(f'{name}: {result!r}: ' + ('ok' if ok else f'expected {expected!r}'))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=20, help='PDFs per export')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+    render_pool.RENDER_WORKERS = args.workers
+    render_pool.MAX_IN_FLIGHT = args.workers * 2
+
+    n = args.invoices
+    ok = check('warm up', export(n), n)
+    kill_child()
+    ok &= check('export after a child died', export(n), n)
+    ok &= check('child killed mid-export', export(n, kill_after={n // 2}), n)
+    ok &= check('pool broken twice in one export', export(n, kill_after={n // 3, 2 * n // 3}), BrokenProcessPool)
+    ok &= check('export after that', export(n), n)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
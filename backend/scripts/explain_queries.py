@@ -0,0 +1,152 @@
+"""Seed a database and print the query plan of every team-scoped endpoint query.
+
+Usage (from backend/):
+    python scripts/explain_queries.py                      # throwaway SQLite file
+    python scripts/explain_queries.py --database-url postgresql://...
+    python scripts/explain_queries.py --teams 20 --invoices 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from sqlalchemy import insert, func
+from database import db
+from models.user import User
+from models.team import Team
+from models.teammembership import TeamMembership
+from models.client import Client
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+
+
+def seed(teams, clients_per_team, invoices_per_team):
+    """Bulk insert a synthetic dataset so the planner has something to choose from"""
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {'id': t, 'firebase_uid': f'uid-{t}', 'email': f'user{t}@example.ma', 'name': f'User {t}'}
+        for t in range(1, teams + 1)
+    ])
+    db.session.execute(insert(Team), [
+        {'id': t, 'name': f'Team {t}', 'owner_id': t} for t in range(1, teams + 1)
+    ])
+    db.session.execute(insert(TeamMembership), [
+        {'user_id': t, 'team_id': t, 'role': 'owner'} for t in range(1, teams + 1)
+    ])
+    client_id = 0
+    invoice_id = 0
+    for t in range(1, teams + 1):
+        first_client = client_id + 1
+        db.session.execute(insert(Client), [
+            {'id': client_id + c, 'team_id': t, 'name': f'Client {client_id + c}', 'ice': f'{client_id + c:015d}'}
+            for c in range(1, clients_per_team + 1)
+        ])
+        client_id += clients_per_team
+        invoices = []
+        items = []
+        for n in range(1, invoices_per_team + 1):
+            invoice_id += 1
+            created_at = now - timedelta(days=random.randint(0, 720), seconds=random.randint(0, 86400))
+            invoices.append({
+                'id': invoice_id, 'team_id': t, 'client_id': random.randint(first_client, client_id),
+                'number': str(n), 'status': random.choice(['paid', 'unpaid', 'overdue']),
+                'amount': round(random.uniform(100, 20000), 2), 'currency': 'MAD',
+                'due_date': (created_at + timedelta(days=30)).date(), 'created_at': created_at,
+            })
+            items.append({'invoice_id': invoice_id, 'description': f'Service {n}',
+                          'quantity': 1.0, 'unit_price': 100.0, 'total': 100.0})
+        db.session.execute(insert(Invoice), invoices)
+        db.session.execute(insert(InvoiceItem), items)
+    db.session.commit()
+
+
+def endpoint_queries(team_id):
+    """The statements each endpoint issues, keyed by a readable label"""
+    year_start = datetime(datetime.utcnow().year, 1, 1)
+    return {
+        'resolver: user + membership + team': db.session.query(User, Team).outerjoin(
+            TeamMembership, TeamMembership.user_id == User.id
+        ).outerjoin(Team, Team.id == TeamMembership.team_id).filter(
+            User.firebase_uid == f'uid-{team_id}').order_by(TeamMembership.id).limit(1),
+        'GET /api/clients/': Client.query.filter_by(team_id=team_id),
+        'GET /api/clients/<id>': Client.query.filter_by(id=1, team_id=team_id),
+        'GET /api/invoices/': Invoice.query.filter_by(team_id=team_id).order_by(
+            Invoice.created_at.desc(), Invoice.id.desc()),
+        'GET /api/invoices/?status=': Invoice.query.filter_by(team_id=team_id, status='paid'),
+        'GET /api/invoices/<id>': Invoice.query.filter_by(id=1, team_id=team_id),
+        'GET /api/invoices/<id> items': InvoiceItem.query.filter_by(invoice_id=1),
+        'invoices by client': Invoice.query.filter_by(team_id=team_id, client_id=1),
+        'invoice number lookup': Invoice.query.filter_by(team_id=team_id, number='1'),
+        'GET /api/dashboard/summary': db.session.query(
+            Invoice.status, func.count(Invoice.id), func.sum(Invoice.amount)
+        ).filter(Invoice.team_id == team_id).group_by(Invoice.status),
+        'GET /api/dashboard/monthly-revenue': db.session.query(
+            func.sum(Invoice.amount)
+        ).filter(Invoice.team_id == team_id, Invoice.status == 'paid', Invoice.created_at >= year_start),
+        'GET /api/teams/me members': TeamMembership.query.filter_by(team_id=team_id),
+        'GET /api/teams/list': TeamMembership.query.filter_by(user_id=team_id),
+    }
+
+
+def explain(query):
+    """Run the dialect's EXPLAIN on a query and return the plan lines"""
+    stmt = query.statement if hasattr(query, 'statement') else query
+    connection = db.session.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    if connection.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    rows = connection.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=50, help='clients per team')
+    parser.add_argument('--invoices', type=int, default=2000, help='invoices per team')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'explain.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(args.teams, args.clients, args.invoices)
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+            # Small seeds make a sequential scan look cheapest; ask for the index path explicitly
+            db.session.execute(db.text('SET enable_seqscan = off'))
+
+        print(f'{db.engine.dialect.name}: {args.teams} teams x {args.invoices} invoices\n')
+        sequential = []
+        for label, query in endpoint_queries(team_id=1).items():
+            plan = explain(query)
+            print(label)
+            for line in plan:
+                print(f'    {line}')
+            if any(line.startswith('SCAN ') and 'USING' not in line or 'Seq Scan' in line for line in plan):
+                sequential.append(label)
+        print()
+        print('sequential scans: ' + (', '.join(sequential) if sequential else 'none'))
+        db.session.rollback()
+        if not args.database_url:
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
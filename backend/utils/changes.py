@@ -0,0 +1,38 @@
+from models.team_change import TeamChange
+from database import db
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from utils.conditional import bump_team_version
+from utils.events import queue_event, change_event
+
+def record_changes(team_id, kind, ids, deleted=False):
+    """Bump the team's data version and mark these entities changed (or deleted) at it.
+
+    Runs in the caller's transaction, after its other writes (see bump_team_version); open
+    event streams hear about it once that commits. Each entity keeps only its latest change,
+    so the log grows with the number of entities rather than the number of writes, and a sync
+    from any older version stays complete.
+    """
+    version = bump_team_version(team_id)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return version
+    queue_event(db.session, team_id, change_event(kind, ids, deleted, version))
+    rows = [
+        {'team_id': team_id, 'kind': kind, 'entity_id': entity_id, 'version': version, 'deleted': deleted}
+        for entity_id in ids
+    ]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_fn = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert_fn(TeamChange).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['team_id', 'kind', 'entity_id'],
+            set_={'version': stmt.excluded.version, 'deleted': stmt.excluded.deleted}
+        ))
+        return version
+    TeamChange.query.filter(
+        TeamChange.team_id == team_id, TeamChange.kind == kind, TeamChange.entity_id.in_(ids)
+    ).delete(synchronize_session=False)
+    db.session.execute(insert(TeamChange), rows)
+    return version
@@ -0,0 +1,71 @@
+from flask import request, make_response
+from utils.team_context import get_current_user_and_team
+from models.team import Team
+from database import db
+from sqlalchemy import update
+from datetime import datetime
+from functools import wraps
+import hashlib
+
+def bump_team_version(team_id):
+    """Mark the team's data as changed, in the caller's transaction; returns the new version.
+
+    Call it last before committing a write: the UPDATE locks the team row until commit, and
+    taking it after every other row keeps concurrent writers from deadlocking on each other.
+    It also makes versions commit in order, which /api/sync relies on.
+    """
+    stmt = update(Team).where(Team.id == team_id).values(
+        data_version=Team.data_version + 1, data_updated_at=datetime.utcnow()
+    ).execution_options(synchronize_session=False)
+    if db.session.get_bind().dialect.update_returning:
+        return db.session.execute(stmt.returning(Team.data_version)).scalar()
+    db.session.execute(stmt)
+    return db.session.query(Team.data_version).filter(Team.id == team_id).scalar()
+
+def bump_team_versions(team_ids):
+    """bump_team_version for many teams at once (maintenance sweeps)"""
+    team_ids = list(team_ids)
+    if not team_ids:
+        return
+    db.session.execute(
+        update(Team).where(Team.id.in_(team_ids)).values(
+            data_version=Team.data_version + 1, data_updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+
+def bump_all_team_versions():
+    """For maintenance writes that may touch every team (rollup rebuilds)"""
+    db.session.execute(
+        update(Team).values(
+            data_version=Team.data_version + 1, data_updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+
+def conditional_get(view):
+    """Answer a GET with 304 when the team's data is unchanged since the client's copy.
+
+    The ETag covers the team's data version, the user, the full URL and today's date (overdue
+    status is derived from it). get_current_user_and_team has just checked the team's version, so
+    If-None-Match costs no query of its own and the view only runs on a miss. If-Modified-Since
+    alone is not honoured: a one-second timestamp cannot tell apart two writes in the same second.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user, team = get_current_user_and_team()
+        today = datetime.utcnow().date()
+        fingerprint = repr((team.id, team.data_version, user.id, request.full_path, today.isoformat()))
+        etag = hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # Derived overdue status changes at midnight even without a write
+        response.last_modified = max(team.data_updated_at or datetime.min, datetime.combine(today, datetime.min.time()))
+        # Let browsers keep the copy but revalidate it on every request
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
@@ -0,0 +1,206 @@
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from collections import deque
+import threading
+import select
+import logging
+import json
+import time
+import os
+
+# Events buffered per stream before its backlog is replaced by a single reset
+EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '64'))
+# Open streams per process; further subscribers get 503. Each stream holds a server thread,
+# so keep this below the worker's thread count (WEB_THREADS) to leave room for other requests
+MAX_EVENT_SUBSCRIBERS = int(os.getenv('MAX_EVENT_SUBSCRIBERS', '48'))
+# Ids listed per event; larger writes (imports, bulk updates) send the kind only
+MAX_EVENT_IDS = 100
+NOTIFY_CHANNEL = 'fatoora_events'
+
+RESET_EVENT = {'type': 'reset'}
+
+class Subscription:
+    """One stream's bounded event queue. Publishers never block: when the queue is full the
+    backlog is replaced by a reset event, telling the client to resync instead."""
+
+    def __init__(self, broker, team_id, maxsize=EVENT_QUEUE_SIZE):
+        self.broker = broker
+        self.team_id = team_id
+        self.maxsize = maxsize
+        self._events = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, event):
+        with self._cond:
+            if len(self._events) >= self.maxsize:
+                self.dropped += len(self._events)
+                self._events.clear()
+                self._events.append(RESET_EVENT)
+            else:
+                self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout):
+        """The next event, or None if none arrived within timeout"""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class LocalBroker:
+    """In-process fan-out from committed writes to the team's open streams"""
+
+    def __init__(self, max_subscribers=MAX_EVENT_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, team_id):
+        """A new Subscription, or None when the process already serves max_subscribers streams"""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(self, team_id)
+            self._subscribers.setdefault(team_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            team = self._subscribers.get(subscription.team_id)
+            if team and subscription in team:
+                team.discard(subscription)
+                self._count -= 1
+                if not team:
+                    del self._subscribers[subscription.team_id]
+
+    def deliver(self, team_id, event):
+        """Hand an event to this process's subscribers of the team"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(team_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def before_commit(self, session, events):
+        pass
+
+    def after_commit(self, events):
+        for team_id, payload in events:
+            self.deliver(team_id, payload)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': self._count, 'teams': len(self._subscribers)}
+
+class PostgresBroker(LocalBroker):
+    """Fans events out to every process with LISTEN/NOTIFY.
+
+    NOTIFY runs inside the writing transaction, so Postgres delivers it only on commit; a
+    listener thread per process, started with the first subscriber, hands it to local streams.
+    """
+
+    def __init__(self, database_url, max_subscribers=MAX_EVENT_SUBSCRIBERS):
+        super().__init__(max_subscribers)
+        self.database_url = database_url
+        self._listener = None
+
+    def subscribe(self, team_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+        return super().subscribe(team_id)
+
+    def before_commit(self, session, events):
+        for team_id, payload in events:
+            session.execute(text('SELECT pg_notify(:channel, :payload)'), {
+                'channel': NOTIFY_CHANNEL, 'payload': json.dumps({'team_id': team_id, 'event': payload})
+            })
+
+    def after_commit(self, events):
+        # Delivered by the listener, in this process too
+        pass
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.database_url)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f'LISTEN {NOTIFY_CHANNEL}')
+                backoff = 1
+                # Notifications sent while reconnecting are lost; tell every stream to resync
+                self._deliver_all(RESET_EVENT)
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.deliver(message['team_id'], message['event'])
+            except Exception as e:
+                logging.error(f"Event listener failed, reconnecting: {str(e)}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _deliver_all(self, event):
+        with self._lock:
+            subscribers = [s for team in self._subscribers.values() for s in team]
+        for subscription in subscribers:
+            subscription.put(event)
+
+def _create_broker():
+    backend = os.getenv('EVENTS_BACKEND', 'local')
+    if backend == 'postgres':
+        return PostgresBroker(os.getenv('DATABASE_URL'))
+    if backend != 'local':
+        raise ValueError(f'Unknown EVENTS_BACKEND {backend!r}; use local or postgres')
+    return LocalBroker()
+
+broker = _create_broker()
+
+def queue_event(session, team_id, payload):
+    """Publish payload to the team's streams once session commits; dropped on rollback"""
+    session.info.setdefault('pending_events', []).append((team_id, payload))
+
+def change_event(kind, ids, deleted, version):
+    ids = list(ids)
+    return {
+        'type': 'change',
+        'version': version,
+        'kind': kind,
+        'ids': ids if len(ids) <= MAX_EVENT_IDS else None,
+        'deleted': deleted
+    }
+
+@event.listens_for(Session, 'before_commit')
+def _before_commit(session):
+    events = session.info.get('pending_events')
+    if events:
+        broker.before_commit(session, events)
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    events = session.info.pop('pending_events', None)
+    if events:
+        try:
+            broker.after_commit(events)
+        except Exception as e:
+            logging.error(f"Could not publish events: {str(e)}")
+
+@event.listens_for(Session, 'after_transaction_end')
+def _after_transaction_end(session, transaction):
+    # Rolled back or closed without committing; savepoints don't count
+    if transaction.parent is None:
+        session.info.pop('pending_events', None)
@@ -0,0 +1,105 @@
+from models.invoice import Invoice
+from models.client import Client
+from models.invoice_item import InvoiceItem
+from database import db
+from sqlalchemy import and_
+from sqlalchemy.orm import selectinload
+from utils.pdf import invoice_pdf_payload, team_logo_path
+from utils.render_pool import render_payloads
+from utils.pdf_cache import pdf_cache, pdf_fingerprint
+import io
+import csv
+import shutil
+import zipfile
+
+CSV_CHUNK_ROWS = 500
+ZIP_BATCH_SIZE = 200
+
+def iter_invoices_csv(team_id, include_items=False):
+    """Yield the team's invoices as CSV text chunks, reading rows through a server-side cursor"""
+    header = ['ID', 'Number', 'Client', 'Status', 'Amount', 'Currency', 'Due Date', 'Created At']
+    columns = [
+        Invoice.id, Invoice.number, Client.name, Invoice.current_status, Invoice.amount,
+        Invoice.currency, Invoice.due_date, Invoice.created_at
+    ]
+    query = db.session.query(*columns).outerjoin(
+        Client, and_(Client.id == Invoice.client_id, Client.team_id == team_id)
+    )
+    if include_items:
+        # One line per invoice item, repeating the invoice columns
+        header += ['Item Description', 'Quantity', 'Unit Price', 'Item Total']
+        query = query.add_columns(
+            InvoiceItem.description, InvoiceItem.quantity, InvoiceItem.unit_price, InvoiceItem.total
+        ).outerjoin(InvoiceItem, InvoiceItem.invoice_id == Invoice.id).order_by(Invoice.id, InvoiceItem.id)
+    else:
+        query = query.order_by(Invoice.id)
+    query = query.filter(Invoice.team_id == team_id).yield_per(CSV_CHUNK_ROWS)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for i, row in enumerate(query, 1):
+        row = list(row)
+        row[2] = row[2] or ''
+        row[6] = row[6].isoformat() if row[6] else ''
+        row[7] = row[7].isoformat() if row[7] else ''
+        writer.writerow(['' if value is None else value for value in row])
+        if i % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+class _ZipStream:
+    """Write-only sink for ZipFile; the caller drains what has been written"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_invoice_payloads(team, logo_path):
+    """Walk the team's invoices in id batches, preloading items and clients per batch; yields (cache_key, payload)"""
+    last_id = 0
+    while True:
+        batch = Invoice.query.options(selectinload(Invoice.items)).filter(
+            Invoice.team_id == team.id,
+            Invoice.id > last_id
+        ).order_by(Invoice.id).limit(ZIP_BATCH_SIZE).all()
+        if not batch:
+            return
+        client_ids = {inv.client_id for inv in batch}
+        clients = {c.id: c for c in Client.query.filter(Client.team_id == team.id, Client.id.in_(client_ids))}
+        for inv in batch:
+            payload = invoice_pdf_payload(inv, clients.get(inv.client_id), team)
+            yield (team.id, inv.id, pdf_fingerprint(payload, logo_path)), payload
+        last_id = batch[-1].id
+
+def iter_invoices_zip(team, on_entry=None):
+    """Yield a ZIP of the team's invoice PDFs as byte chunks; on_entry() is called after each PDF"""
+    logo_path = team_logo_path(team)
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        # Entries are written in completion order as the render pool finishes them
+        entries = iter_invoice_payloads(team, logo_path)
+        for number, source in render_payloads(entries, logo_url=logo_path, cache=pdf_cache):
+            if isinstance(source, bytes):
+                zf.writestr(f'invoice_{number}.pdf', source)
+            else:
+                # Copied from the cache file in small blocks
+                with source, zf.open(f'invoice_{number}.pdf', 'w') as entry:
+                    shutil.copyfileobj(source, entry)
+            if on_entry:
+                on_entry()
+            yield stream.drain()
+    yield stream.drain()
@@ -1,7 +1,14 @@
 import firebase_admin
 from firebase_admin import auth, credentials
 from flask import request, abort
+from collections import OrderedDict
+from google.auth import jwt
+import hashlib
+import requests
+import threading
+import time
 import os
+import re
 import json
 import logging
 
@@ -32,17 +39,148 @@ if not firebase_admin._apps:
     
     firebase_admin.initialize_app(cred)
 
+# Public certificates Google signs Firebase ID tokens with
+ID_TOKEN_CERT_URL = ('https://www.googleapis.com/robot/v1/metadata/x509/'
+                     'securetoken@system.gserviceaccount.com')
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+# Unknown key ids refetch the certificates at most this often; anyone can send a made-up kid
+CERT_REFRESH_MIN_INTERVAL_SECONDS = 30
+
+def fetch_google_certs():
+    """Download Google's signing certificates, returning (certs, max_age_seconds)"""
+    response = requests.get(ID_TOKEN_CERT_URL, timeout=10)
+    response.raise_for_status()
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    max_age = int(match.group(1)) if match else 3600
+    return response.json(), max_age
+
+class PublicKeyCache:
+    """Signing certificates kept in memory until their Cache-Control max-age lapses"""
+
+    def __init__(self, fetcher=fetch_google_certs, min_refresh_interval=CERT_REFRESH_MIN_INTERVAL_SECONDS):
+        # fetcher returns ({kid: pem_certificate}, max_age); swap it for a local key set in tests
+        self.fetcher = fetcher
+        self.min_refresh_interval = min_refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self._certs = None
+        self._expires_at = 0
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, force_refresh=False):
+        """The current certificates. force_refresh refetches unexpired ones, but not more than
+        once per min_refresh_interval; within it the copy just fetched is returned."""
+        with self._lock:
+            now = time.time()
+            fresh = self._certs is not None and now < self._expires_at
+            if fresh and (not force_refresh or now - self._fetched_at < self.min_refresh_interval):
+                self.hits += 1
+                return self._certs
+            self.misses += 1
+            certs, max_age = self.fetcher()
+            self._certs = certs
+            self._fetched_at = time.time()
+            self._expires_at = self._fetched_at + max_age
+            return certs
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'keys': len(self._certs or {})}
+
+class TokenCache:
+    """Bounded LRU of decoded ID tokens, keyed by a SHA-256 of the token and expiring at its exp claim"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token):
+        key = self._key(id_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, decoded_token = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(decoded_token)
+
+    def put(self, id_token, decoded_token):
+        expires_at = decoded_token.get('exp')
+        if not expires_at:
+            return
+        key = self._key(id_token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(decoded_token))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+public_key_cache = PublicKeyCache()
+token_cache = TokenCache(maxsize=int(os.getenv('FIREBASE_TOKEN_CACHE_SIZE', '1024')))
+
+def decode_id_token(id_token, project_id=None):
+    """Verify a Firebase ID token against the cached signing certificates"""
+    cached = token_cache.get(id_token)
+    if cached is not None:
+        return cached
+
+    if os.getenv('FIREBASE_AUTH_EMULATOR_HOST'):
+        # Emulator tokens are unsigned; let the SDK handle them
+        decoded_token = auth.verify_id_token(id_token)
+    else:
+        project_id = project_id or firebase_admin.get_app().project_id
+        # Checked before the key cache, so malformed tokens never cause a certificate fetch
+        header = jwt.decode_header(id_token)
+        if header.get('alg') != 'RS256':
+            raise ValueError(f"Token has incorrect algorithm: {header.get('alg')}")
+        kid = header.get('kid')
+        if not kid:
+            raise ValueError('Token has no "kid" claim')
+        certs = public_key_cache.get()
+        if kid not in certs:
+            # Google rotated its keys before our copy expired
+            certs = public_key_cache.get(force_refresh=True)
+            if kid not in certs:
+                raise ValueError('Token was signed with an unknown key')
+        decoded_token = jwt.decode(id_token, certs=certs, audience=project_id)
+        if decoded_token.get('iss') != ID_TOKEN_ISSUER_PREFIX + project_id:
+            raise ValueError(f"Token has incorrect issuer: {decoded_token.get('iss')}")
+        subject = decoded_token.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError('Token has an invalid "sub" claim')
+        decoded_token['uid'] = subject
+
+    token_cache.put(id_token, decoded_token)
+    return decoded_token
+
 def verify_firebase_token():
     auth_header = request.headers.get('Authorization', None)
-    logging.warning(f"Authorization header: {auth_header}")
     if not auth_header or not auth_header.startswith('Bearer '):
         logging.error("Missing or invalid Authorization header")
         abort(401, 'Missing or invalid Authorization header')
     id_token = auth_header.split(' ')[1]
     try:
-        decoded_token = auth.verify_id_token(id_token)
-        logging.warning(f"Decoded Firebase token: {decoded_token}")
-        return decoded_token
+        return decode_id_token(id_token)
     except Exception as e:
         logging.error(f"Invalid Firebase token: {str(e)}")
-        abort(401, f'Invalid Firebase token: {str(e)}') 
\ No newline at end of file
+        abort(401, f'Invalid Firebase token: {str(e)}')
\ No newline at end of file
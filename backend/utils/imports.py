@@ -0,0 +1,266 @@
+from flask import request, abort
+from models.client import Client
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from database import db
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from utils.invoice_items import item_rows
+from utils.invoice_numbers import allocate_invoice_numbers
+from utils.rollups import invoice_snapshot, add_invoices
+from utils.changes import record_changes
+from datetime import datetime, date
+from types import SimpleNamespace
+import io
+import csv
+import json
+import logging
+import os
+
+# Records written per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+# Errors listed in the report; the failed count always covers every row
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_STATUSES = ('paid', 'unpaid')
+CLIENT_FIELDS = ('name', 'phone', 'ice', 'if_number')
+# Header aliases, so a CSV produced by the invoice export can be imported back
+HEADER_ALIASES = {'client': 'client_name', 'item_description': 'description'}
+
+def _normalise_key(key):
+    key = (key or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+def _iter_csv(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for record in reader:
+        yield reader.line_num, {_normalise_key(k): (v or '').strip() for k, v in record.items() if k}
+
+def _iter_json_lines(stream):
+    for line_num, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_num, e
+            continue
+        if not isinstance(record, dict):
+            yield line_num, ValueError('Each line must be a JSON object')
+            continue
+        yield line_num, {_normalise_key(k): v for k, v in record.items()}
+
+def request_records():
+    """Iterate (line number, record) over the uploaded CSV or JSON-lines body.
+
+    The body is the raw request or a multipart 'file' field; ?format=csv|jsonl overrides
+    the Content-Type. Unparseable lines yield an exception in place of the record.
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    content_type = (upload.mimetype if upload else request.mimetype) or ''
+    fmt = request.args.get('format') or ('jsonl' if 'json' in content_type else 'csv')
+    if fmt == 'csv':
+        if not upload:
+            # TextIOWrapper needs a buffered binary stream
+            stream = io.BufferedReader(stream)
+        return _iter_csv(stream)
+    if fmt in ('jsonl', 'ndjson'):
+        return _iter_json_lines(stream)
+    abort(400, 'format must be csv or jsonl')
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line_num, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line_num, 'error': message})
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+
+def _flush(report, chunk, write):
+    """Write one chunk of (line number, row) in its own transaction"""
+    if not chunk:
+        return
+    try:
+        write([row for _, row in chunk])
+        db.session.commit()
+        report.imported += len(chunk)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logging.error(f"Import chunk failed: {str(e)}")
+        for line_num, _ in chunk:
+            report.error(line_num, 'Could not be saved')
+    chunk.clear()
+
+def _text(record, name):
+    value = record.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _client_row(record):
+    row = {field: _text(record, field) for field in CLIENT_FIELDS}
+    if not row['name']:
+        raise ValueError('name is required')
+    return row
+
+def import_clients(team_id, records):
+    """Validate and insert client records in chunks; returns an ImportReport"""
+    report = ImportReport()
+    chunk = []
+
+    def write(rows):
+        ids = db.session.scalars(
+            insert(Client).returning(Client.id, sort_by_parameter_order=True),
+            [dict(row, team_id=team_id) for row in rows]
+        ).all()
+        record_changes(team_id, 'client', ids)
+
+    for line_num, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            chunk.append((line_num, _client_row(record)))
+        except ValueError as e:
+            report.error(line_num, str(e))
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _flush(report, chunk, write)
+    _flush(report, chunk, write)
+    return report
+
+def _group_invoices(records):
+    """Merge consecutive CSV rows sharing a ref (or export Number/ID) into one invoice with items"""
+    current = None
+    current_key = None
+    for line_num, record in records:
+        if isinstance(record, Exception) or 'items' in record:
+            if current:
+                yield current
+                current = None
+            yield line_num, record
+            continue
+        key = _text(record, 'ref') or _text(record, 'number') or _text(record, 'id')
+        item = {field: record.get(field) for field in ('description', 'quantity', 'unit_price')}
+        has_item = any(value not in (None, '') for value in item.values())
+        if current and key and key == current_key:
+            if has_item:
+                current[1]['items'].append(item)
+            continue
+        if current:
+            yield current
+        current = (line_num, dict(record, items=[item] if has_item else []))
+        current_key = key
+    if current:
+        yield current
+
+def _parse_date(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f'{name} must be a YYYY-MM-DD date')
+
+def _parse_datetime(value):
+    if value in (None, ''):
+        return datetime.utcnow()
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError('created_at must be an ISO date or datetime')
+
+def _invoice_row(record, client_ids, client_names):
+    if record.get('client_id') not in (None, ''):
+        try:
+            client_id = int(record['client_id'])
+        except (TypeError, ValueError):
+            raise ValueError('client_id must be an integer')
+        if client_id not in client_ids:
+            raise ValueError('Client not found or not in your team')
+    elif _text(record, 'client_name'):
+        client_id = client_names.get(_text(record, 'client_name'))
+        if client_id is None:
+            raise ValueError(f"Unknown client {_text(record, 'client_name')!r}")
+    else:
+        raise ValueError('client_id or client is required')
+
+    status = (_text(record, 'status') or 'unpaid').lower()
+    if status == 'overdue':
+        # Derived from the due date on read
+        status = 'unpaid'
+    if status not in IMPORT_STATUSES:
+        raise ValueError('status must be "paid" or "unpaid"')
+
+    items = record.get('items') or []
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError('items must be a list of objects')
+    try:
+        items, amount = item_rows([{k: v for k, v in item.items() if v not in (None, '')} for item in items])
+        if not items and record.get('amount') not in (None, ''):
+            amount = float(record['amount'])
+    except (TypeError, ValueError):
+        raise ValueError('quantity, unit_price and amount must be numbers')
+
+    return {
+        'client_id': client_id,
+        'status': status,
+        'amount': amount,
+        'currency': _text(record, 'currency') or 'MAD',
+        'due_date': _parse_date(record.get('due_date'), 'due_date'),
+        'created_at': _parse_datetime(record.get('created_at')),
+    }, items
+
+def import_invoices(team, records):
+    """Validate and insert invoices with their items in chunks; returns an ImportReport.
+
+    Each chunk takes its numbers from the team sequence in one block, in file order.
+    """
+    team_id = team.id
+    report = ImportReport()
+    client_ids = set()
+    client_names = {}
+    for client_id, name in db.session.query(Client.id, Client.name).filter_by(team_id=team_id).order_by(Client.id):
+        client_ids.add(client_id)
+        client_names.setdefault(name, client_id)
+
+    chunk = []
+
+    def write(rows):
+        numbers = allocate_invoice_numbers(team, len(rows))
+        invoice_rows = [dict(invoice_row, team_id=team_id, number=number)
+                        for (invoice_row, _), number in zip(rows, numbers)]
+        ids = db.session.scalars(
+            insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True), invoice_rows
+        ).all()
+        item_values = [dict(item, invoice_id=invoice_id) for invoice_id, (_, items) in zip(ids, rows) for item in items]
+        if item_values:
+            db.session.execute(insert(InvoiceItem), item_values)
+        add_invoices(team_id, [invoice_snapshot(SimpleNamespace(**row)) for row in invoice_rows])
+        record_changes(team_id, 'invoice', ids)
+
+    for line_num, record in _group_invoices(records):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            chunk.append((line_num, _invoice_row(record, client_ids, client_names)))
+        except ValueError as e:
+            report.error(line_num, str(e))
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _flush(report, chunk, write)
+    _flush(report, chunk, write)
+    return report
@@ -0,0 +1,58 @@
+from models.invoice_item import InvoiceItem
+from database import db
+from sqlalchemy import insert, update, delete, select
+
+ITEM_FIELDS = ('description', 'quantity', 'unit_price', 'total')
+
+def item_rows(items_data):
+    """Normalise request items into column dicts; returns (rows, total amount)"""
+    rows = []
+    total_amount = 0
+    for item_data in items_data:
+        quantity = float(item_data.get('quantity', 1))
+        unit_price = float(item_data.get('unit_price', 0))
+        total = quantity * unit_price
+        total_amount += total
+        rows.append({
+            'description': item_data.get('description', ''),
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total': total
+        })
+    return rows, total_amount
+
+def insert_items(invoice_id, rows):
+    """Insert every row in one executemany"""
+    if rows:
+        db.session.execute(insert(InvoiceItem), [dict(row, invoice_id=invoice_id) for row in rows])
+
+def replace_items(invoice, rows):
+    """Make the invoice's items match rows, line by line, touching only lines that changed.
+
+    Lines are compared by position, so order is preserved: a changed line is updated in
+    place, extra existing lines are deleted and extra new lines inserted, each as a single
+    statement however many lines are affected. Returns (updated, inserted, deleted) counts.
+    """
+    existing = db.session.execute(
+        select(InvoiceItem.id, *(getattr(InvoiceItem, f) for f in ITEM_FIELDS))
+        .where(InvoiceItem.invoice_id == invoice.id)
+        .order_by(InvoiceItem.id)
+    ).all()
+
+    changed = [
+        dict(row, id=current.id)
+        for current, row in zip(existing, rows)
+        if tuple(current[1:]) != tuple(row[f] for f in ITEM_FIELDS)
+    ]
+    removed = [current.id for current in existing[len(rows):]]
+    added = rows[len(existing):]
+
+    if changed:
+        # ORM bulk UPDATE by primary key
+        db.session.execute(update(InvoiceItem), changed)
+    if removed:
+        db.session.execute(delete(InvoiceItem).where(InvoiceItem.id.in_(removed)))
+    insert_items(invoice.id, added)
+    # The bulk statements bypass the loaded collection
+    db.session.expire(invoice, ['items'])
+    return len(changed), len(added), len(removed)
@@ -0,0 +1,125 @@
+from models.invoice import Invoice
+from models.invoice_sequence import InvoiceSequence
+from database import db
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from string import Formatter
+import re
+
+DEFAULT_NUMBER_FORMAT = '{n}'
+NUMBER_FORMAT_FIELDS = ('n', 'year')
+MAX_NUMBER_FORMAT_LENGTH = 64
+
+def _fields(number_format):
+    return [name for _, name, _, _ in Formatter().parse(number_format) if name is not None]
+
+def validate_number_format(number_format):
+    """Raise ValueError unless number_format is usable, e.g. 'FAC-{year}-{n:04d}'"""
+    if not isinstance(number_format, str) or len(number_format) > MAX_NUMBER_FORMAT_LENGTH:
+        raise ValueError(f'Number format must be a string of at most {MAX_NUMBER_FORMAT_LENGTH} characters')
+    try:
+        fields = _fields(number_format)
+    except ValueError:
+        raise ValueError('Number format is not a valid format string')
+    if fields.count('n') != 1 or any(name not in NUMBER_FORMAT_FIELDS for name in fields):
+        raise ValueError('Number format must contain {n} once and may only use {n} and {year}')
+    try:
+        number_format.format(n=1, year=2000)
+    except ValueError:
+        raise ValueError('Number format is not a valid format string')
+
+def team_number_format(team):
+    return team.invoice_number_format or DEFAULT_NUMBER_FORMAT
+
+def sequence_scope(number_format, today):
+    """Formats showing the year restart their count every year"""
+    return str(today.year) if 'year' in _fields(number_format) else ''
+
+def _number_pattern(number_format, year):
+    """Regex matching numbers this format produces in this year, capturing n"""
+    pattern = ''
+    for literal, name, _, _ in Formatter().parse(number_format):
+        pattern += re.escape(literal)
+        if name == 'n':
+            pattern += r'(\d+)'
+        elif name == 'year':
+            pattern += re.escape(str(year))
+    return re.compile(pattern + '$')
+
+def _existing_max(team_id, number_format, year):
+    """Highest n already used in this scope, so sequences pick up after pre-existing numbers"""
+    pattern = _number_pattern(number_format, year)
+    highest = 0
+    for (number,) in db.session.query(Invoice.number).filter(Invoice.team_id == team_id).yield_per(1000):
+        match = pattern.match(number or '')
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+def _create_sequence(team_id, scope, seed):
+    values = {'team_id': team_id, 'scope': scope, 'last_value': seed}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_fn = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        db.session.execute(insert_fn(InvoiceSequence).values(**values).on_conflict_do_nothing())
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(InvoiceSequence).values(**values))
+    except IntegrityError:
+        # Created concurrently
+        pass
+
+def _increment(team_id, scope, count):
+    """Advance the sequence by count and return its new value, or None if it does not exist yet.
+
+    The UPDATE row lock is held until the caller's transaction ends, so concurrent creates in
+    a team queue up behind each other and a rolled back create gives its numbers back.
+    """
+    where = (InvoiceSequence.team_id == team_id, InvoiceSequence.scope == scope)
+    if db.session.get_bind().dialect.update_returning:
+        stmt = update(InvoiceSequence).where(*where).values(
+            last_value=InvoiceSequence.last_value + count
+        ).returning(InvoiceSequence.last_value)
+        return db.session.execute(stmt).scalar()
+    sequence = InvoiceSequence.query.filter(*where).with_for_update().first()
+    if sequence is None:
+        return None
+    sequence.last_value += count
+    db.session.flush()
+    return sequence.last_value
+
+def allocate_invoice_numbers(team, count=1, today=None):
+    """Reserve count consecutive invoice numbers for the team in the caller's transaction"""
+    number_format = team_number_format(team)
+    today = today or datetime.utcnow().date()
+    scope = sequence_scope(number_format, today)
+    last = _increment(team.id, scope, count)
+    if last is None:
+        _create_sequence(team.id, scope, _existing_max(team.id, number_format, today.year))
+        last = _increment(team.id, scope, count)
+    return [number_format.format(n=n, year=today.year) for n in range(last - count + 1, last + 1)]
+
+def reseed_sequence(team, today=None):
+    """Call after changing the team's number format, in the same transaction.
+
+    Formats sharing a scope share its counter, which only seeded from existing numbers when it
+    was created; move it past the highest number the new format already used, so switching
+    'FAC-{n}' back to '{n}' cannot hand out a number that exists.
+    """
+    number_format = team_number_format(team)
+    today = today or datetime.utcnow().date()
+    scope = sequence_scope(number_format, today)
+    # Locks the row, so creates wait for the new seed
+    last = _increment(team.id, scope, 0)
+    if last is None:
+        # Seeded from the existing numbers on first use
+        return
+    highest = _existing_max(team.id, number_format, today.year)
+    if highest > last:
+        _increment(team.id, scope, highest - last)
+
+def next_invoice_number(team, today=None):
+    return allocate_invoice_numbers(team, 1, today)[0]
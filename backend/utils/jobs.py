@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+from models.job import Job
+from models.team import Team
+from models.invoice import Invoice
+from models.client import Client
+from database import db
+from utils.exports import iter_invoices_csv, iter_invoices_zip
+from utils.pdf import invoice_pdf_payload, render_invoice_payload, team_logo_path
+from datetime import datetime, timedelta
+from sqlalchemy import update
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+ARTIFACT_DIR = os.getenv('JOB_ARTIFACT_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache', 'jobs'))
+JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', '24'))
+# Jobs still 'running' this long after starting are taken to have died with their process
+JOB_TIMEOUT_MINUTES = int(os.getenv('JOB_TIMEOUT_MINUTES', '60'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+        return _executor
+
+def _write_artifact(job, extension, mode, write):
+    """write(f) fills the job's artifact file, which is renamed into place once complete"""
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path = os.path.join(ARTIFACT_DIR, f'{job.id}.{extension}')
+    fd, tmp_path = tempfile.mkstemp(dir=ARTIFACT_DIR, suffix='.tmp')
+    # Text is written as-is in UTF-8, matching the synchronous exports byte for byte
+    text_options = {} if 'b' in mode else {'encoding': 'utf-8', 'newline': ''}
+    try:
+        with os.fdopen(fd, mode, **text_options) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+def _remove_artifact(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _set_progress(job_id, progress):
+    # Own connection, so progress is visible while the job's session is mid-transaction
+    with db.engine.begin() as connection:
+        connection.execute(update(Job).where(Job.id == job_id).values(progress=progress))
+
+def _run_invoices_csv(job, params):
+    path = _write_artifact(job, 'csv', 'w', lambda f: f.writelines(iter_invoices_csv(job.team_id, params.get('items', False))))
+    return path, 'invoices.csv', 'text/csv'
+
+def _run_invoices_zip(job, params):
+    team = db.session.get(Team, job.team_id)
+    job_id = job.id
+    done = [0]
+
+    def on_entry():
+        done[0] += 1
+        if done[0] % 10 == 0:
+            _set_progress(job_id, done[0])
+
+    path = _write_artifact(job, 'zip', 'wb', lambda f: f.writelines(iter_invoices_zip(team, on_entry=on_entry)))
+    return path, 'invoices.zip', 'application/zip'
+
+def _run_invoice_pdf(job, params):
+    team = db.session.get(Team, job.team_id)
+    invoice = Invoice.query.filter_by(id=params['invoice_id'], team_id=team.id).first()
+    if not invoice:
+        raise ValueError('Invoice not found')
+    client = Client.query.filter_by(id=invoice.client_id, team_id=team.id).first()
+    if not client:
+        raise ValueError('Client not found')
+    payload = invoice_pdf_payload(invoice, client, team)
+    path = _write_artifact(job, 'pdf', 'wb', lambda f: render_invoice_payload(payload, team_logo_path(team), out=f))
+    return path, f'invoice_{invoice.number}.pdf', 'application/pdf'
+
+def _count_invoices(team_id, params):
+    return Invoice.query.filter_by(team_id=team_id).count()
+
+# kind -> (runner, total counter)
+JOB_KINDS = {
+    'invoices_csv': (_run_invoices_csv, None),
+    'invoices_zip': (_run_invoices_zip, _count_invoices),
+    'invoice_pdf': (_run_invoice_pdf, lambda team_id, params: 1),
+}
+
+def _run(app, job_id):
+    with app.app_context():
+        # Claim atomically so a job dispatched twice (e.g. by resume_queued_jobs) runs once
+        claimed = Job.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            return
+        job = db.session.get(Job, job_id)
+        params = json.loads(job.params or '{}')
+        runner, counter = JOB_KINDS[job.kind]
+        try:
+            if counter:
+                job.total = counter(job.team_id, params)
+                db.session.commit()
+            path, name, mimetype = runner(job, params)
+            job = db.session.get(Job, job_id)
+            if job is None:
+                # Deleted with its team meanwhile
+                _remove_artifact(path)
+                return
+            job.artifact_path, job.artifact_name, job.mimetype = path, name, mimetype
+            job.progress = job.total if job.total is not None else job.progress
+            job.status = 'done'
+        except Exception as e:
+            logging.error(f"Job {job_id} ({job.kind}) failed: {str(e)}")
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            if job is None:
+                return
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+def submit_job(app, team_id, user_id, kind, params=None):
+    """Record a queued job and hand it to the local worker pool"""
+    if kind not in JOB_KINDS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job(id=uuid.uuid4().hex, team_id=team_id, user_id=user_id, kind=kind,
+              params=json.dumps(params or {}), status='queued')
+    db.session.add(job)
+    db.session.commit()
+    get_executor().submit(_run, app, job.id)
+    return job
+
+def resume_queued_jobs(app, timeout_minutes=JOB_TIMEOUT_MINUTES):
+    """Dispatch jobs left queued by a previous process, requeueing those whose process died
+    mid-run (still 'running' after timeout_minutes)"""
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
+        requeued = Job.query.filter(Job.status == 'running', Job.started_at < cutoff).update(
+            {'status': 'queued', 'started_at': None, 'progress': 0}, synchronize_session=False
+        )
+        db.session.commit()
+        if requeued:
+            logging.warning(f"Requeued {requeued} jobs running for over {timeout_minutes} minutes")
+        job_ids = [job_id for (job_id,) in db.session.query(Job.id).filter_by(status='queued').all()]
+    for job_id in job_ids:
+        get_executor().submit(_run, app, job_id)
+    return len(job_ids)
+
+def purge_jobs(max_age_hours=JOB_RETENTION_HOURS):
+    """Delete finished jobs older than max_age_hours together with their artifacts"""
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    jobs = Job.query.filter(Job.status.in_(['done', 'failed']), Job.finished_at < cutoff).all()
+    for job in jobs:
+        if job.artifact_path:
+            _remove_artifact(job.artifact_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(jobs)
+
+def delete_team_jobs(team_id):
+    """Delete all of a team's jobs and their artifacts; the caller commits"""
+    paths = [path for (path,) in db.session.query(Job.artifact_path).filter(
+        Job.team_id == team_id, Job.artifact_path.isnot(None))]
+    Job.query.filter_by(team_id=team_id).delete(synchronize_session=False)
+    for path in paths:
+        _remove_artifact(path)
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'download_url': f'/api/jobs/{job.id}/download' if job.status == 'done' else None
+    }
@@ -0,0 +1,54 @@
+from models.invoice import Invoice
+from utils.rollups import shift_status
+from utils.conditional import bump_team_versions
+from database import db
+from sqlalchemy import update
+from datetime import datetime
+import threading
+import logging
+import time
+
+def sweep_overdue_invoices(today=None):
+    """Mark every lapsed unpaid invoice overdue in one set-based UPDATE; returns the row count"""
+    today = today or datetime.utcnow().date()
+    lapsed = [Invoice.status == 'unpaid', Invoice.due_date < today]
+    columns = (Invoice.team_id, Invoice.currency, Invoice.amount)
+    # Rollup deltas come from the rows this statement changed, so a concurrent sweep or status
+    # edit can't make the same invoice move twice
+    stmt = update(Invoice).where(*lapsed).values(status='overdue')
+    if db.session.get_bind().dialect.update_returning:
+        rows = db.session.execute(stmt.returning(*columns)).all()
+    else:
+        locked = db.session.query(Invoice.id, *columns).filter(*lapsed).with_for_update(skip_locked=True).all()
+        rows = [row[1:] for row in locked]
+        if locked:
+            db.session.execute(update(Invoice).where(Invoice.id.in_([row.id for row in locked])).values(
+                status='overdue'))
+    # Move the affected totals between rollup buckets in the same transaction
+    totals = {}
+    for team_id, currency, amount in rows:
+        key = (team_id, currency or 'MAD')
+        count, total = totals.get(key, (0, 0))
+        totals[key] = (count + 1, total + (amount or 0))
+    for (team_id, currency), (count, amount) in totals.items():
+        shift_status(team_id, currency, 'unpaid', 'overdue', count, float(amount))
+    bump_team_versions({team_id for team_id, _ in totals})
+    db.session.commit()
+    return len(rows)
+
+def start_overdue_sweeper(app, interval_seconds):
+    """Run the sweep every interval_seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                with app.app_context():
+                    updated = sweep_overdue_invoices()
+                    if updated:
+                        logging.info(f"Overdue sweeper flipped {updated} invoices")
+            except Exception as e:
+                logging.error(f"Overdue sweep failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name='overdue-sweeper', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,41 @@
+from flask import request, abort, jsonify
+from datetime import datetime, date
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+def encode_cursor(*values):
+    """Opaque, URL-safe token holding the sort key of the last row of a page"""
+    raw = json.dumps(values, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; aborts with 400 on a malformed token"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        abort(400, 'Invalid cursor')
+    if not isinstance(values, list):
+        abort(400, 'Invalid cursor')
+    return values
+
+def get_page_size():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit < 1:
+        abort(400, 'limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def paginated_response(payload, next_cursor):
+    """Return the page as a JSON list; the next cursor travels in the X-Next-Cursor header"""
+    response = jsonify(payload)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -1,10 +1,13 @@
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
 from io import BytesIO
+from types import SimpleNamespace
+from functools import lru_cache
+from PIL import Image as PILImage
 from datetime import datetime
 import os
 
@@ -25,45 +28,166 @@ def number_to_words_french(amount):
     else:
         return f"{int(amount)} dirhams"
 
-def render_invoice_pdf(invoice, client, team, logo_url=None):
-    """Generate a PDF invoice using ReportLab"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=colors.HexColor('#2563eb'),
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#1f2937')
+UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+
+def team_logo_path(team):
+    """Convert a team's logo URL to a file path, or None if there is no usable file"""
+    if not team.logo_url:
+        return None
+    # Extract filename from URL like '/api/teams/logo/team_1_logo_filename.png'
+    filename = team.logo_url.split('/')[-1]
+    logo_path = os.path.join(UPLOAD_FOLDER, filename)
+    return logo_path if os.path.exists(logo_path) else None
+
+TEAM_PDF_FIELDS = ('name', 'ice', 'if_number', 'cnie', 'professional_tax_number', 'address', 'phone', 'email')
+CLIENT_PDF_FIELDS = ('name', 'ice', 'if_number')
+
+def invoice_pdf_payload(invoice, client, team, items=None):
+    """Detach the fields the renderer reads into picklable objects, e.g. for a process pool"""
+    items = invoice.items if items is None else items
+    return (
+        SimpleNamespace(
+            number=invoice.number, status=invoice.status, current_status=invoice.current_status,
+            amount=invoice.amount, currency=invoice.currency, due_date=invoice.due_date,
+            created_at=invoice.created_at,
+            items=[SimpleNamespace(description=i.description, quantity=i.quantity,
+                                   unit_price=i.unit_price, total=i.total) for i in items]
+        ),
+        SimpleNamespace(**{field: getattr(client, field, None) for field in CLIENT_PDF_FIELDS}),
+        SimpleNamespace(**{field: getattr(team, field) for field in TEAM_PDF_FIELDS})
     )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=6
+
+def render_invoice_payload(payload, logo_url=None, out=None):
+    """Render an invoice_pdf_payload; returns (number, pdf_bytes), or (number, out) when given a sink. Runs in pool workers."""
+    invoice, client, team = payload
+    return invoice.number, render_invoice_pdf(invoice, client, team, logo_url=logo_url, out=out)
+
+@lru_cache(maxsize=None)
+def render_context():
+    """Paragraph and table styles shared by every invoice rendered in this process"""
+    styles = getSampleStyleSheet()
+    return SimpleNamespace(
+        title_style=ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            textColor=colors.HexColor('#2563eb'),
+            alignment=TA_CENTER
+        ),
+        heading_style=ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=12,
+            textColor=colors.HexColor('#1f2937')
+        ),
+        normal_style=ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceAfter=6
+        ),
+        header_table_style=TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
+        details_table_style=TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f3f4f6')),
+        ]),
+        items_table_style=TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),  # Description column left-aligned
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#fbbf24')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
     )
+
+# Logos are drawn at 1 inch; 300 px keeps them sharp in print
+LOGO_MAX_PIXELS = 300
+
+@lru_cache(maxsize=64)
+def _decoded_logo(path, mtime_ns, size):
+    """Decode and downscale a logo once, returning PNG bytes (cached per path and mtime)"""
+    with PILImage.open(path) as img:
+        img.load()
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA')
+        img.thumbnail((LOGO_MAX_PIXELS, LOGO_MAX_PIXELS))
+        out = BytesIO()
+        img.save(out, format='PNG', optimize=False)
+    return out.getvalue()
+
+def load_logo(path):
+    """Pre-resized PNG bytes for a logo file, or None if it is missing or unreadable"""
+    try:
+        stat = os.stat(path)
+        return _decoded_logo(path, stat.st_mtime_ns, stat.st_size)
+    except Exception:
+        return None
+
+def clear_render_caches():
+    render_context.cache_clear()
+    _decoded_logo.cache_clear()
+
+def _build(story, out):
+    """Build story into out, any object with write(); returns the PDF bytes when out is None.
+
+    ReportLab assembles the document in memory and then makes a single write() call, so a
+    file or stream sink keeps exactly one copy of the document alive.
+    """
+    buffer = BytesIO() if out is None else out
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    doc.build(story)
+    return buffer.getvalue() if out is None else out
+
+def render_invoice_pdf(invoice, client, team, logo_url=None, out=None):
+    """Generate a PDF invoice using ReportLab, into out if given"""
+    return _build(invoice_story(invoice, client, team, logo_url), out)
+
+def render_invoices_pdf(invoices, logo_url=None, out=None):
+    """Lay out many invoices in one document, one or more pages each.
+
+    invoices is an iterable of (invoice, client, team) triples; styles, fonts and the
+    logo image are shared, so the logo is embedded once however many invoices there are.
+    Written into out if given, like render_invoice_pdf.
+    """
+    story = []
+    for invoice, client, team in invoices:
+        if story:
+            story.append(PageBreak())
+        story.extend(invoice_story(invoice, client, team, logo_url))
+    if not story:
+        story.append(Spacer(1, 1))
+    return _build(story, out)
+
+def invoice_story(invoice, client, team, logo_url=None):
+    """The flowables making up one invoice"""
+    # Styles are built once per process
+    ctx = render_context()
+    title_style = ctx.title_style
+    heading_style = ctx.heading_style
+    normal_style = ctx.normal_style
     
     # Build the document content
     story = []
     
     # Header with logo and company info
     header_data = []
-    if logo_url and os.path.exists(logo_url):
+    logo_png = load_logo(logo_url) if logo_url else None
+    if logo_png:
         try:
-            logo = Image(logo_url, width=1*inch, height=1*inch)
+            logo = Image(BytesIO(logo_png), width=1*inch, height=1*inch)
             company_info = [
                 Paragraph(f"<b>{team.name or 'Your Company'}</b>", heading_style),
                 Paragraph(f"ICE: {team.ice or 'N/A'}", normal_style),
@@ -82,10 +206,7 @@ def render_invoice_pdf(invoice, client, team, logo_url=None):
     
     if header_data[0]:
         header_table = Table(header_data, colWidths=[2*inch, 4*inch])
-        header_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
+        header_table.setStyle(ctx.header_table_style)
         story.append(header_table)
         story.append(Spacer(1, 20))
     
@@ -111,18 +232,13 @@ def render_invoice_pdf(invoice, client, team, logo_url=None):
             Paragraph(f"ICE: {client.ice or 'N/A'}", normal_style)
         ],
         [
-            Paragraph(f"Statut: {invoice.status.upper()}", normal_style),
+            Paragraph(f"Statut: {invoice.current_status.upper()}", normal_style),
             Paragraph(f"IF: {client.if_number or 'N/A'}", normal_style)
         ]
     ]
     
     details_table = Table(details_data, colWidths=[3*inch, 3*inch])
-    details_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f3f4f6')),
-    ]))
+    details_table.setStyle(ctx.details_table_style)
     story.append(details_table)
     story.append(Spacer(1, 30))
     
@@ -148,19 +264,7 @@ def render_invoice_pdf(invoice, client, team, logo_url=None):
     items_data.append(['', '', 'TOTAL:', f"{invoice.amount:.2f} {invoice.currency}"])
     
     items_table = Table(items_data, colWidths=[3*inch, 1*inch, 1.5*inch, 1.5*inch])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),  # Description column left-aligned
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#fbbf24')),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    items_table.setStyle(ctx.items_table_style)
     story.append(items_table)
     story.append(Spacer(1, 30))
     
@@ -188,7 +292,4 @@ def render_invoice_pdf(invoice, client, team, logo_url=None):
         if team.professional_tax_number:
             story.append(Paragraph(f"Taxe Professionnelle N°: {team.professional_tax_number}", normal_style))
     
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue() 
\ No newline at end of file
+    return story 
\ No newline at end of file
@@ -0,0 +1,168 @@
+from datetime import date, datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache', 'pdfs'))
+CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+_logo_hashes = {}
+
+def _logo_hash(logo_path):
+    """SHA-256 of the logo file, remembered per (path, mtime, size)"""
+    if not logo_path:
+        return None
+    stat = os.stat(logo_path)
+    key = (logo_path, stat.st_mtime_ns, stat.st_size)
+    if key not in _logo_hashes:
+        digest = hashlib.sha256()
+        with open(logo_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        _logo_hashes[key] = digest.hexdigest()
+    return _logo_hashes[key]
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return vars(value)
+
+def pdf_fingerprint(payload, logo_path=None):
+    """Content hash of everything a rendered invoice PDF depends on (see utils.pdf.invoice_pdf_payload)"""
+    invoice, client, team = payload
+    content = json.dumps(
+        [vars(invoice), vars(client), vars(team), _logo_hash(logo_path)],
+        default=_json_default, sort_keys=True
+    )
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class PdfCache:
+    """Rendered PDFs on disk under <dir>/<team_id>/<invoice_id>-<fingerprint>.pdf, evicted least recently used first"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _team_dir(self, team_id):
+        return os.path.join(self.directory, str(team_id))
+
+    def path_for(self, team_id, invoice_id, fingerprint):
+        return os.path.join(self._team_dir(team_id), f'{invoice_id}-{fingerprint}.pdf')
+
+    def get(self, team_id, invoice_id, fingerprint):
+        """Path of the cached PDF, or None; a hit refreshes the entry's LRU position"""
+        path = self.path_for(team_id, invoice_id, fingerprint)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, team_id, invoice_id, fingerprint, pdf_bytes):
+        """Store a rendered PDF, replacing older renders of the same invoice; returns its path or None"""
+        return self.write(team_id, invoice_id, fingerprint, lambda f: f.write(pdf_bytes))
+
+    def write(self, team_id, invoice_id, fingerprint, render):
+        """Like put, but render(f) writes the PDF straight into the entry's file"""
+        path = self.path_for(team_id, invoice_id, fingerprint)
+        tmp_path = None
+        try:
+            os.makedirs(self._team_dir(team_id), exist_ok=True)
+            # A current entry may be streaming to another request; os.replace swaps it atomically
+            self.invalidate_invoice(team_id, invoice_id, keep=os.path.basename(path))
+            fd, tmp_path = tempfile.mkstemp(dir=self._team_dir(team_id), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                render(f)
+                written = f.tell()
+            try:
+                written -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Could not write PDF cache entry {path}: {str(e)}")
+            return None
+        finally:
+            # Only left behind when writing or rendering failed
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += written
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.pdf'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Delete least recently used entries until the cache is below 90% of max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(entry[1] for entry in entries)
+            target = self.max_bytes * 0.9
+            for _, entry_size, path in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                    size -= entry_size
+                except OSError:
+                    pass
+            self._size = size
+
+    def invalidate_invoice(self, team_id, invoice_id, keep=None):
+        """Delete the invoice's cached renders, except the file named keep"""
+        team_dir = self._team_dir(team_id)
+        prefix = f'{invoice_id}-'
+        try:
+            names = [name for name in os.listdir(team_dir) if name.startswith(prefix) and name != keep]
+        except OSError:
+            return
+        removed = 0
+        for name in names:
+            path = os.path.join(team_dir, name)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                removed += size
+            except OSError:
+                pass
+        with self._lock:
+            if self._size is not None:
+                self._size -= removed
+
+    def invalidate_team(self, team_id):
+        shutil.rmtree(self._team_dir(team_id), ignore_errors=True)
+        with self._lock:
+            self._size = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'max_bytes': self.max_bytes}
+
+pdf_cache = PdfCache()
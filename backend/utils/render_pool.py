@@ -0,0 +1,130 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from utils.pdf import render_invoice_payload
+import multiprocessing
+import threading
+import os
+
+# Shared by every export in this worker process; 0 renders inline
+RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(os.cpu_count() or 1)))
+# In-flight renders per export, bounding memory held by finished-but-unwritten PDFs
+MAX_IN_FLIGHT = int(os.getenv('PDF_RENDER_MAX_IN_FLIGHT', str(max(RENDER_WORKERS, 1) * 2)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn keeps children free of the parent's DB connections and locks
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def _discard_executor(executor):
+    """Drop a pool left broken by a dead child, so the next get_executor starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _open(path):
+    # An open handle survives a concurrent eviction or invalidation of the entry
+    try:
+        return open(path, 'rb') if path else None
+    except OSError:
+        return None
+
+def _cached(cache, cache_key):
+    if cache is None or cache_key is None:
+        return None
+    return _open(cache.get(*cache_key))
+
+def _store(cache, cache_key, result):
+    """Swap rendered bytes for the cache file holding them, so callers can stream from disk"""
+    number, pdf_bytes = result
+    if cache is not None and cache_key is not None:
+        f = _open(cache.put(*cache_key, pdf_bytes))
+        if f:
+            return number, f
+    return result
+
+def _render_inline(cache, cache_key, payload, logo_url):
+    if cache is not None and cache_key is not None:
+        # Render straight into the cache file rather than through an in-memory copy
+        f = _open(cache.write(*cache_key, lambda out: render_invoice_payload(payload, logo_url, out=out)))
+        if f:
+            return payload[0].number, f
+    return render_invoice_payload(payload, logo_url)
+
+def render_payloads(entries, logo_url=None, cache=None):
+    """Yield (number, source) as renders finish, with at most MAX_IN_FLIGHT pending.
+
+    entries yields (cache_key, payload) pairs; cache_key is (team_id, invoice_id, fingerprint)
+    for a utils.pdf_cache.PdfCache, or None to always render. source is the PDF bytes, or
+    an open binary file over the cached PDF which the caller closes.
+    """
+    if RENDER_WORKERS <= 0:
+        for cache_key, payload in entries:
+            f = _cached(cache, cache_key)
+            yield (payload[0].number, f) if f else _render_inline(cache, cache_key, payload, logo_url)
+        return
+
+    executor = get_executor()
+    # future -> (cache_key, payload), kept so renders lost with a broken pool can be resubmitted
+    pending = {}
+    restarted = False
+
+    def submit(cache_key, payload):
+        pending[executor.submit(render_invoice_payload, payload, logo_url)] = (cache_key, payload)
+
+    def restart(error):
+        """A child died (OOM kill, crash in the renderer): resubmit what was in flight to a fresh
+        pool, once per export, so a payload that keeps killing children fails the export instead"""
+        nonlocal executor, restarted
+        _discard_executor(executor)
+        if restarted:
+            raise error
+        restarted = True
+        executor = get_executor()
+        lost = list(pending.values())
+        pending.clear()
+        for cache_key, payload in lost:
+            submit(cache_key, payload)
+
+    def collect(done):
+        for future in done:
+            if future not in pending:
+                # Resubmitted by a restart earlier in this batch
+                continue
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                restart(e)
+                continue
+            yield _store(cache, pending.pop(future)[0], result)
+
+    try:
+        for cache_key, payload in entries:
+            f = _cached(cache, cache_key)
+            if f:
+                yield payload[0].number, f
+                continue
+            if len(pending) >= MAX_IN_FLIGHT:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+            try:
+                submit(cache_key, payload)
+            except BrokenProcessPool as e:
+                restart(e)
+                submit(cache_key, payload)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        # Client went away mid-download: drop queued renders
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,141 @@
+from models.invoice import Invoice
+from models.team_stats import TeamStats, TeamMonthlyRevenue
+from database import db
+from sqlalchemy import extract, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from utils.conditional import bump_team_version, bump_all_team_versions
+
+def invoice_snapshot(invoice):
+    """The fields of an invoice that feed the rollups; None for a missing invoice"""
+    if invoice is None:
+        return None
+    return {
+        'status': invoice.status or 'unpaid',
+        'currency': invoice.currency or 'MAD',
+        'amount': invoice.amount or 0,
+        'created_at': invoice.created_at
+    }
+
+def _upsert(model, keys, deltas):
+    """Add deltas to the row identified by keys, creating it if needed"""
+    dialect = db.session.get_bind().dialect.name
+    values = {**keys, **deltas}
+    if dialect in ('postgresql', 'sqlite'):
+        insert_fn = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert_fn(model).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in deltas}
+        )
+        db.session.execute(stmt)
+        return
+    updated = model.query.filter_by(**keys).update(
+        {getattr(model, name): getattr(model, name) + delta for name, delta in deltas.items()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.execute(insert(model).values(**values))
+
+def _apply(team_id, snapshot, sign):
+    _upsert(TeamStats, {
+        'team_id': team_id, 'status': snapshot['status'], 'currency': snapshot['currency']
+    }, {'invoice_count': sign, 'total_amount': sign * snapshot['amount']})
+    if snapshot['status'] == 'paid' and snapshot['created_at']:
+        _upsert(TeamMonthlyRevenue, {
+            'team_id': team_id,
+            'year': snapshot['created_at'].year,
+            'month': snapshot['created_at'].month,
+            'currency': snapshot['currency']
+        }, {'paid_count': sign, 'paid_amount': sign * snapshot['amount']})
+
+def apply_invoice_change(team_id, before, after):
+    """Move an invoice's contribution from its before snapshot to its after snapshot.
+
+    Runs in the caller's transaction, so the rollups commit together with the invoice.
+    """
+    if before == after:
+        return
+    if before:
+        _apply(team_id, before, -1)
+    if after:
+        _apply(team_id, after, 1)
+
+def apply_invoice_changes(team_id, changes):
+    """apply_invoice_change for many (before, after) pairs, with one upsert per touched bucket"""
+    stats = {}
+    monthly = {}
+    for before, after in changes:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if not snapshot:
+                continue
+            key = (snapshot['status'], snapshot['currency'])
+            count, amount = stats.get(key, (0, 0))
+            stats[key] = (count + sign, amount + sign * snapshot['amount'])
+            if snapshot['status'] == 'paid' and snapshot['created_at']:
+                key = (snapshot['created_at'].year, snapshot['created_at'].month, snapshot['currency'])
+                count, amount = monthly.get(key, (0, 0))
+                monthly[key] = (count + sign, amount + sign * snapshot['amount'])
+    for (status, currency), (count, amount) in stats.items():
+        if count or amount:
+            _upsert(TeamStats, {'team_id': team_id, 'status': status, 'currency': currency},
+                    {'invoice_count': count, 'total_amount': amount})
+    for (year, month, currency), (count, amount) in monthly.items():
+        if count or amount:
+            _upsert(TeamMonthlyRevenue, {'team_id': team_id, 'year': year, 'month': month, 'currency': currency},
+                    {'paid_count': count, 'paid_amount': amount})
+
+def add_invoices(team_id, snapshots):
+    """Count many new invoices at once (bulk imports)"""
+    apply_invoice_changes(team_id, ((None, snapshot) for snapshot in snapshots))
+
+def shift_status(team_id, currency, from_status, to_status, count, amount):
+    """Move count invoices worth amount from one status bucket to another (bulk updates)"""
+    if not count:
+        return
+    _upsert(TeamStats, {'team_id': team_id, 'status': from_status, 'currency': currency},
+            {'invoice_count': -count, 'total_amount': -amount})
+    _upsert(TeamStats, {'team_id': team_id, 'status': to_status, 'currency': currency},
+            {'invoice_count': count, 'total_amount': amount})
+
+def rebuild_rollups(team_id=None):
+    """Recompute the rollup tables from invoices, for one team or all of them"""
+    stats_query = TeamStats.query
+    monthly_query = TeamMonthlyRevenue.query
+    invoice_filter = []
+    if team_id is not None:
+        stats_query = stats_query.filter_by(team_id=team_id)
+        monthly_query = monthly_query.filter_by(team_id=team_id)
+        invoice_filter.append(Invoice.team_id == team_id)
+    stats_query.delete(synchronize_session=False)
+    monthly_query.delete(synchronize_session=False)
+
+    status = func.coalesce(Invoice.status, 'unpaid')
+    currency = func.coalesce(Invoice.currency, 'MAD')
+    stats_rows = db.session.query(
+        Invoice.team_id, status, currency, func.count(Invoice.id), func.coalesce(func.sum(Invoice.amount), 0)
+    ).filter(Invoice.team_id.isnot(None), *invoice_filter).group_by(Invoice.team_id, status, currency).all()
+    if stats_rows:
+        db.session.execute(insert(TeamStats), [
+            {'team_id': t, 'status': s, 'currency': c, 'invoice_count': n, 'total_amount': float(a)}
+            for t, s, c, n, a in stats_rows
+        ])
+
+    year = extract('year', Invoice.created_at)
+    month = extract('month', Invoice.created_at)
+    monthly_rows = db.session.query(
+        Invoice.team_id, year, month, currency, func.count(Invoice.id), func.coalesce(func.sum(Invoice.amount), 0)
+    ).filter(
+        Invoice.team_id.isnot(None), Invoice.status == 'paid', Invoice.created_at.isnot(None), *invoice_filter
+    ).group_by(Invoice.team_id, year, month, currency).all()
+    if monthly_rows:
+        db.session.execute(insert(TeamMonthlyRevenue), [
+            {'team_id': t, 'year': int(y), 'month': int(m), 'currency': c, 'paid_count': n, 'paid_amount': float(a)}
+            for t, y, m, c, n, a in monthly_rows
+        ])
+    # Dashboards read the rollups; drop their cached copies
+    if team_id is not None:
+        bump_team_version(team_id)
+    else:
+        bump_all_team_versions()
+    db.session.commit()
+    return len(stats_rows), len(monthly_rows)
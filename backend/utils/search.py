@@ -0,0 +1,323 @@
+from models.client import Client
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from database import db
+from sqlalchemy import and_, func, or_, select, text
+from bisect import bisect_left, insort
+from collections import OrderedDict
+import heapq
+import os
+import re
+import threading
+import time
+
+# Seconds a team's in-memory index is trusted; writes in other processes show up after this
+SEARCH_INDEX_TTL = float(os.getenv('SEARCH_INDEX_TTL', '300'))
+# Teams whose index is kept per process; the least recently searched is dropped beyond this
+SEARCH_INDEX_MAX_TEAMS = int(os.getenv('SEARCH_INDEX_MAX_TEAMS', '64'))
+MAX_QUERY_TERMS = 8
+
+# (column, weight): a match in a heavier field ranks higher
+CLIENT_SEARCH_FIELDS = (('name', 3), ('ice', 2), ('if_number', 2), ('phone', 1))
+INVOICE_NUMBER_WEIGHT = 3
+ITEM_DESCRIPTION_WEIGHT = 1
+
+# (index, table, column) created by the trigram search migration on Postgres
+TRIGRAM_INDEXES = [
+    ('ix_clients_name_trgm', 'clients', 'name'),
+    ('ix_clients_ice_trgm', 'clients', 'ice'),
+    ('ix_clients_if_number_trgm', 'clients', 'if_number'),
+    ('ix_clients_phone_trgm', 'clients', 'phone'),
+    ('ix_invoices_number_trgm', 'invoices', 'number'),
+    ('ix_invoice_items_description_trgm', 'invoice_items', 'description'),
+]
+
+_TOKEN = re.compile(r'\w+')
+
+def tokenize(value):
+    return _TOKEN.findall((value or '').lower())
+
+class InvertedIndex:
+    """Token -> {document key: field weight} postings, with prefix lookup over the sorted vocabulary.
+
+    A forward index (document -> {token: weight}) lets a multi-word query expand only its most
+    selective word through the postings and check the others per candidate, so common words
+    don't make a query scan the whole team.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self.tokens = []
+        self.frozen = False
+        # Held by searches and by replace, once the index is shared between requests
+        self._lock = threading.Lock()
+
+    def add(self, key, value, weight):
+        document = self.documents.setdefault(key, {})
+        for token in tokenize(value):
+            if document.get(token, 0) < weight:
+                document[token] = weight
+                if token not in self.postings:
+                    self.postings[token] = {}
+                    if self.frozen:
+                        insort(self.tokens, token)
+                self.postings[token][key] = weight
+
+    def _remove(self, key):
+        for token in self.documents.pop(key, {}):
+            postings = self.postings[token]
+            del postings[key]
+            if not postings:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+
+    def freeze(self):
+        self.tokens = sorted(self.postings)
+        self.frozen = True
+
+    def replace(self, documents):
+        """Swap the contents of frozen documents for {key: [(value, weight), ...]}; an empty list removes one"""
+        with self._lock:
+            for key, fields in documents.items():
+                self._remove(key)
+                for value, weight in fields:
+                    self.add(key, value, weight)
+                if not self.documents.get(key):
+                    self.documents.pop(key, None)
+
+    def _vocabulary(self, term):
+        """Tokens starting with term"""
+        start = bisect_left(self.tokens, term)
+        end = start
+        while end < len(self.tokens) and self.tokens[end].startswith(term):
+            end += 1
+        return self.tokens[start:end]
+
+    @staticmethod
+    def _score(weight, token, term):
+        # Whole-word matches count double
+        return weight * (2 if token == term else 1)
+
+    def search(self, terms):
+        """Documents where every term starts some word, with their summed scores"""
+        if not terms:
+            return {}
+        with self._lock:
+            return self._search(terms)
+
+    def _search(self, terms):
+        expansions = sorted(
+            ((sum(len(self.postings[token]) for token in vocabulary), term, vocabulary)
+             for term, vocabulary in ((term, self._vocabulary(term)) for term in terms)),
+            key=lambda expansion: expansion[0]
+        )
+        _, first, vocabulary = expansions[0]
+        scores = {}
+        for token in vocabulary:
+            for key, weight in self.postings[token].items():
+                score = self._score(weight, token, first)
+                if scores.get(key, 0) < score:
+                    scores[key] = score
+        for _, term, _ in expansions[1:]:
+            remaining = {}
+            for key, score in scores.items():
+                best = max((self._score(weight, token, term) for token, weight in self.documents[key].items()
+                            if token.startswith(term)), default=0)
+                if best:
+                    remaining[key] = score + best
+            scores = remaining
+            if not scores:
+                break
+        return scores
+
+# team_id -> (expires, index), least recently used first
+_indexes = OrderedDict()
+# team_id -> token of the build in flight; a write in the meantime withdraws it, as the build
+# may have read the rows before the write and must not be cached
+_building = {}
+_lock = threading.Lock()
+
+def invalidate_search(team_id):
+    """Drop the team's index (bulk imports, team deletion); other processes catch up within SEARCH_INDEX_TTL"""
+    with _lock:
+        _indexes.pop(team_id, None)
+        _building.pop(team_id, None)
+
+def _client_fields(team_id, ids=None):
+    """(document key, value, weight) for the team's clients, or only those in ids"""
+    columns = [getattr(Client, field) for field, _ in CLIENT_SEARCH_FIELDS]
+    query = db.session.query(Client.id, *columns).filter(Client.team_id == team_id)
+    if ids is not None:
+        query = query.filter(Client.id.in_(ids))
+    for row in query.yield_per(1000):
+        for (field, weight), value in zip(CLIENT_SEARCH_FIELDS, row[1:]):
+            yield ('client', row[0]), value, weight
+
+def _invoice_fields(team_id, ids=None):
+    """(document key, value, weight) for the team's invoices and their items, or only those in ids"""
+    numbers = db.session.query(Invoice.id, Invoice.number).filter(Invoice.team_id == team_id)
+    items = db.session.query(InvoiceItem.invoice_id, InvoiceItem.description).join(
+        Invoice, Invoice.id == InvoiceItem.invoice_id).filter(Invoice.team_id == team_id)
+    if ids is not None:
+        numbers = numbers.filter(Invoice.id.in_(ids))
+        items = items.filter(Invoice.id.in_(ids))
+    for invoice_id, number in numbers.yield_per(1000):
+        yield ('invoice', invoice_id), number, INVOICE_NUMBER_WEIGHT
+    for invoice_id, description in items.yield_per(1000):
+        yield ('invoice', invoice_id), description, ITEM_DESCRIPTION_WEIGHT
+
+SEARCH_DOCUMENT_FIELDS = {'client': _client_fields, 'invoice': _invoice_fields}
+
+def build_team_index(team_id):
+    index = InvertedIndex()
+    for fields in SEARCH_DOCUMENT_FIELDS.values():
+        for key, value, weight in fields(team_id):
+            index.add(key, value, weight)
+    index.freeze()
+    return index
+
+def update_search(team_id, kind, ids, deleted=False):
+    """Re-read the written clients or invoices (kind 'client' or 'invoice') into this process's
+    index of the team, after commit; other processes catch up within SEARCH_INDEX_TTL"""
+    with _lock:
+        _building.pop(team_id, None)
+        entry = _indexes.get(team_id)
+    if entry is None or time.time() >= entry[0]:
+        return
+    ids = list(ids)
+    documents = {(kind, id): [] for id in ids}
+    if not deleted and ids:
+        # Rows deleted since the commit come back with no fields and drop out
+        for key, value, weight in SEARCH_DOCUMENT_FIELDS[kind](team_id, ids):
+            documents[key].append((value, weight))
+    entry[1].replace(documents)
+
+def _team_index(team_id):
+    with _lock:
+        entry = _indexes.get(team_id)
+        if entry and time.time() < entry[0]:
+            _indexes.move_to_end(team_id)
+            return entry[1]
+        _building[team_id] = token = object()
+    try:
+        index = build_team_index(team_id)
+    except BaseException:
+        with _lock:
+            if _building.get(team_id) is token:
+                del _building[team_id]
+        raise
+    now = time.time()
+    with _lock:
+        if _building.get(team_id) is not token:
+            # Written meanwhile, or a later build is in flight; serve this one without caching it
+            return index
+        del _building[team_id]
+        _indexes[team_id] = (now + SEARCH_INDEX_TTL, index)
+        _indexes.move_to_end(team_id)
+        for key in [key for key, (expires, _) in _indexes.items() if expires <= now]:
+            del _indexes[key]
+        while len(_indexes) > SEARCH_INDEX_MAX_TEAMS:
+            _indexes.popitem(last=False)
+    return index
+
+_trigram = {}
+
+def _use_trigram():
+    """Postgres with pg_trgm installed (see the trigram index migration); otherwise the Python index"""
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return False
+    if bind.url not in _trigram:
+        _trigram[bind.url] = db.session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return _trigram[bind.url]
+
+def _contains(column, term):
+    # Terms are \w+, so only _ needs escaping; lower(column) matches the trigram index expression
+    pattern = '%' + term.replace('_', '\\_') + '%'
+    return func.lower(column).like(pattern, escape='\\')
+
+def _trigram_clients(team_id, terms, query, limit):
+    columns = [(getattr(Client, field), weight) for field, weight in CLIENT_SEARCH_FIELDS]
+    score = func.greatest(*[func.similarity(func.lower(column), query) * weight for column, weight in columns])
+    rows = db.session.query(Client.id, score).filter(
+        Client.team_id == team_id,
+        *[or_(*[_contains(column, term) for column, _ in columns]) for term in terms]
+    ).order_by(score.desc(), Client.id).limit(limit).all()
+    return [('client', id, float(s or 0)) for id, s in rows]
+
+def _trigram_invoices(team_id, terms, query, limit):
+    item_score = select(func.max(func.similarity(func.lower(InvoiceItem.description), query))).where(
+        InvoiceItem.invoice_id == Invoice.id
+    ).scalar_subquery()
+    score = (func.similarity(func.lower(Invoice.number), query) * INVOICE_NUMBER_WEIGHT
+             + func.coalesce(item_score, 0) * ITEM_DESCRIPTION_WEIGHT)
+    conditions = [
+        or_(
+            _contains(Invoice.number, term),
+            Invoice.id.in_(select(InvoiceItem.invoice_id).where(_contains(InvoiceItem.description, term)))
+        ) for term in terms
+    ]
+    rows = db.session.query(Invoice.id, score).filter(
+        Invoice.team_id == team_id, *conditions
+    ).order_by(score.desc(), Invoice.id).limit(limit).all()
+    return [('invoice', id, float(s or 0)) for id, s in rows]
+
+def _hydrate(team_id, ranked):
+    """Current fields for a page of (kind, id, score), in rank order; rows deleted since indexing drop out.
+
+    Rows are fetched by primary key alone and the team checked here, so the lookup cost does not
+    depend on the planner preferring the primary key over the team_id indexes.
+    """
+    client_ids = [id for kind, id, _ in ranked if kind == 'client']
+    invoice_ids = [id for kind, id, _ in ranked if kind == 'invoice']
+    found = {}
+    if client_ids:
+        for c in db.session.query(
+                Client.id, Client.team_id, Client.name, Client.ice, Client.if_number, Client.phone
+        ).filter(Client.id.in_(client_ids)):
+            if c.team_id != team_id:
+                continue
+            found[('client', c.id)] = {
+                'type': 'client', 'id': c.id, 'name': c.name, 'ice': c.ice, 'if_number': c.if_number, 'phone': c.phone
+            }
+    if invoice_ids:
+        rows = db.session.query(
+            Invoice.id, Invoice.team_id, Invoice.number, Invoice.client_id, Client.name, Invoice.amount,
+            Invoice.currency, Invoice.current_status, Invoice.created_at
+        ).outerjoin(Client, and_(Client.id == Invoice.client_id, Client.team_id == team_id)).filter(
+            Invoice.id.in_(invoice_ids))
+        for id, row_team_id, number, client_id, client_name, amount, currency, status, created_at in rows:
+            if row_team_id != team_id:
+                continue
+            found[('invoice', id)] = {
+                'type': 'invoice', 'id': id, 'number': number, 'client_id': client_id, 'client_name': client_name,
+                'amount': amount, 'currency': currency, 'status': status,
+                'created_at': created_at.isoformat() if created_at else None
+            }
+    return [dict(found[(kind, id)], score=round(score, 4)) for kind, id, score in ranked if (kind, id) in found]
+
+def search(team_id, query, kinds=('client', 'invoice'), offset=0, limit=50):
+    """Ranked matches for query among the team's clients and invoices.
+
+    Every query word must match, as a substring on Postgres with pg_trgm or as a word prefix in
+    the in-memory index elsewhere. Returns (results, has_more).
+    """
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], False
+    wanted = offset + limit + 1
+    if _use_trigram():
+        query = ' '.join(terms)
+        ranked = []
+        if 'client' in kinds:
+            ranked += _trigram_clients(team_id, terms, query, wanted)
+        if 'invoice' in kinds:
+            ranked += _trigram_invoices(team_id, terms, query, wanted)
+    else:
+        ranked = [(kind, id, float(score)) for (kind, id), score in _team_index(team_id).search(terms).items()
+                  if kind in kinds]
+    page = heapq.nsmallest(wanted, ranked, key=lambda match: (-match[2], match[0], match[1]))[offset:]
+    return _hydrate(team_id, page[:limit]), len(page) > limit
@@ -0,0 +1,131 @@
+from flask import g
+from sqlalchemy.orm import make_transient_to_detached
+from utils.firebase_auth import verify_firebase_token
+from models.user import User
+from models.team import Team
+from models.teammembership import TeamMembership
+from database import db
+import threading
+import time
+import os
+
+# Short-lived, per-process cache of resolved (user, team) rows keyed by firebase uid. Entries are
+# checked against the team's data_version on every use, which other processes bump on team and
+# membership edits, so a removed member or an edited team is never served stale
+CACHE_TTL_SECONDS = float(os.getenv('USER_TEAM_CACHE_TTL', '30'))
+_cache = {}
+# Member lists per team and data_version, same TTL; dropped by invalidate_team
+_members_cache = {}
+_lock = threading.Lock()
+
+def _snapshot(obj):
+    return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs}
+
+def _restore(model, values):
+    """Attach a cached row to the current session without hitting the database"""
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+def _cache_get(uid):
+    with _lock:
+        entry = _cache.get(uid)
+        if entry is None:
+            return None
+        if time.time() >= entry[0]:
+            del _cache[uid]
+            return None
+        return entry
+
+def _cache_put(uid, user, team):
+    entry = (time.time() + CACHE_TTL_SECONDS, _snapshot(user), _snapshot(team))
+    with _lock:
+        _cache[uid] = entry
+
+def invalidate_user(firebase_uid):
+    with _lock:
+        _cache.pop(firebase_uid, None)
+
+def invalidate_team(team_id):
+    """Drop every cached entry resolving to this team (team edits, membership changes)"""
+    with _lock:
+        for uid in [uid for uid, entry in _cache.items() if entry[2]['id'] == team_id]:
+            del _cache[uid]
+        _members_cache.pop(team_id, None)
+
+def get_team_members(team_id, version=None):
+    """The team's members as dicts (id, email, name, role) in join order, from one joined query.
+
+    Pass the team's current data_version to ignore a list cached before a membership change.
+    """
+    with _lock:
+        entry = _members_cache.get(team_id)
+        if entry and time.time() < entry[0] and entry[2] == version:
+            return entry[1]
+    rows = db.session.query(
+        User.id, User.email, User.name, TeamMembership.role
+    ).join(
+        TeamMembership, TeamMembership.user_id == User.id
+    ).filter(TeamMembership.team_id == team_id).order_by(TeamMembership.id).all()
+    members = [{'id': id, 'email': email, 'name': name, 'role': role} for id, email, name, role in rows]
+    with _lock:
+        _members_cache[team_id] = (time.time() + CACHE_TTL_SECONDS, members, version)
+    return members
+
+def _provision(user_info, user):
+    """Create or link the user and give them a team, in a single transaction"""
+    if user is None:
+        # Always try to find by email, even if firebase_uid is different or empty
+        user = User.query.filter_by(email=user_info.get('email', '')).first()
+        if user:
+            user.firebase_uid = user_info['uid']
+            user.name = user_info.get('name', user.name)
+        else:
+            user = User(
+                firebase_uid=user_info['uid'],
+                email=user_info.get('email', ''),
+                name=user_info.get('name', '')
+            )
+            db.session.add(user)
+        db.session.flush()
+    membership = TeamMembership.query.filter_by(user_id=user.id).order_by(TeamMembership.id).first()
+    if membership:
+        team = membership.team
+    else:
+        # Auto-create a team for this user
+        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
+        db.session.add(team)
+        db.session.flush()
+        db.session.add(TeamMembership(user_id=user.id, team_id=team.id, role='owner'))
+    db.session.commit()
+    return user, team
+
+def get_current_user_and_team():
+    """Resolve the authenticated user and their team once per request"""
+    if 'current_user_and_team' in g:
+        return g.current_user_and_team
+
+    user_info = verify_firebase_token()
+    uid = user_info['uid']
+    cached = _cache_get(uid)
+    if cached:
+        # One primary-key lookup; a removed membership or team edit elsewhere bumped the version
+        version = db.session.query(Team.data_version).filter(Team.id == cached[2]['id']).scalar()
+        if version != cached[2]['data_version']:
+            invalidate_user(uid)
+            cached = None
+    if cached:
+        user, team = _restore(User, cached[1]), _restore(Team, cached[2])
+    else:
+        row = db.session.query(User, Team).outerjoin(
+            TeamMembership, TeamMembership.user_id == User.id
+        ).outerjoin(
+            Team, Team.id == TeamMembership.team_id
+        ).filter(User.firebase_uid == uid).order_by(TeamMembership.id).first()
+        user, team = row if row else (None, None)
+        if user is None or team is None:
+            user, team = _provision(user_info, user)
+        _cache_put(uid, user, team)
+
+    g.current_user_and_team = (user, team)
+    return user, team
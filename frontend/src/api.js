@@ -25,8 +25,94 @@ async function request(method, url, data) {
   return res.json();
 }
 
+// Follow X-Next-Cursor across a keyset-paginated list endpoint
+async function requestAll(url) {
+  const headers = {
+    'Content-Type': 'application/json',
+    'Authorization': `Bearer ${getToken()}`,
+  };
+  const rows = [];
+  let cursor = null;
+  do {
+    const sep = url.includes('?') ? '&' : '?';
+    const pageUrl = cursor ? `${url}${sep}cursor=${encodeURIComponent(cursor)}&limit=200` : `${url}${sep}limit=200`;
+    const res = await fetch(API_BASE + pageUrl, { method: 'GET', headers });
+    if (!res.ok) {
+      const err = await res.json().catch(() => ({}));
+      throw new Error(err.message || res.statusText);
+    }
+    rows.push(...(await res.json()));
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return rows;
+}
+
+// Follow the team's server-sent event stream, reconnecting with backoff until unsubscribed.
+// fetch rather than EventSource so the token travels in the Authorization header.
+// onChange runs (debounced) on every connect and on each change or reset event.
+function subscribeEvents(onChange) {
+  let closed = false;
+  let controller = null;
+  let timer = null;
+  let delay = 1000;
+  const notify = () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => { if (!closed) onChange(); }, 250);
+  };
+
+  const connect = async () => {
+    while (!closed) {
+      controller = new AbortController();
+      try {
+        const res = await fetch(API_BASE + '/events/', {
+          headers: { 'Authorization': `Bearer ${getToken()}` },
+          signal: controller.signal,
+        });
+        if (!res.ok || !res.body) throw new Error(res.statusText);
+        delay = 1000;
+        // Anything written while we were disconnected
+        notify();
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const messages = buffer.split('\n\n');
+          buffer = messages.pop();
+          if (messages.some(message => /^event: (change|reset)$/m.test(message))) notify();
+        }
+      } catch (err) {
+        if (closed) return;
+        delay = Math.min(delay * 2, 30000);
+      }
+      if (!closed) await new Promise(resolve => setTimeout(resolve, delay));
+    }
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (controller) controller.abort();
+  };
+}
+
+// Apply a /sync delta to a loaded list: replace or add changed rows, drop deleted ids, re-sort
+export function mergeChanges(rows, changed, deletedIds, compare) {
+  const gone = new Set(deletedIds);
+  const byId = new Map(rows.filter(row => !gone.has(row.id)).map(row => [row.id, row]));
+  changed.forEach(row => byId.set(row.id, row));
+  return [...byId.values()].sort(compare);
+}
+
 export const api = {
   get: (url) => request('GET', url),
+  getAll: (url) => requestAll(url),
+  // Changes since a version from a previous sync; without one, just the current version and reset: true
+  sync: (since) => request('GET', since ? `/sync/?since=${encodeURIComponent(since)}` : '/sync/'),
+  // Returns an unsubscribe function, for useEffect cleanup
+  subscribe: (onChange) => subscribeEvents(onChange),
   post: (url, data) => request('POST', url, data),
   put: (url, data) => request('PUT', url, data),
   patch: (url, data) => request('PATCH', url, data),
@@ -1,5 +1,5 @@
-import { useEffect, useState } from 'react';
-import { api } from '../api';
+import { useEffect, useRef, useState } from 'react';
+import { api, mergeChanges } from '../api';
 import { useTranslation } from 'react-i18next';
 import { Users, Plus, Trash2, Phone, Building, Hash, Search, UserPlus } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
@@ -81,10 +81,15 @@ function Clients() {
   const [searchQuery, setSearchQuery] = useState('');
   const [showForm, setShowForm] = useState(false);
 
+  const syncVersion = useRef(null);
+
   const fetchClients = async () => {
     setLoading(true);
     try {
-      const data = await api.get('/clients/');
+      // Take the version first: anything written during the load comes back in the next sync
+      const { version } = await api.sync(null);
+      const data = await api.getAll('/clients/');
+      syncVersion.current = version;
       setClients(data);
     } catch (err) {
       setError(err.message);
@@ -92,8 +97,27 @@ function Clients() {
     setLoading(false);
   };
 
+  // After a mutation, pull only what changed instead of the whole list
+  const refreshClients = async () => {
+    // Still loading; that load already covers it
+    if (!syncVersion.current) return;
+    try {
+      const changes = await api.sync(syncVersion.current);
+      if (changes.reset) {
+        await fetchClients();
+        return;
+      }
+      syncVersion.current = changes.version;
+      setClients(rows => mergeChanges(rows, changes.clients, changes.deleted.clients, (a, b) => a.id - b.id));
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
   useEffect(() => {
     fetchClients();
+    // Pick up writes by other team members as they happen
+    return api.subscribe(() => refreshClients());
   }, []);
 
   const handleChange = (e) => {
@@ -108,7 +132,7 @@ function Clients() {
       await api.post('/clients/', form);
       setForm({ name: '', phone: '', ice: '', if_number: '' });
       setShowForm(false);
-      fetchClients();
+      refreshClients();
     } catch (err) {
       setError(err.message);
     }
@@ -119,7 +143,7 @@ function Clients() {
     if (!window.confirm(t('delete') + '?')) return;
     try {
       await api.delete(`/clients/${id}`);
-      fetchClients();
+      refreshClients();
     } catch (err) {
       setError(err.message);
     }
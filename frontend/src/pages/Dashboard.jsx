@@ -133,13 +133,13 @@ function Dashboard() {
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    const fetchData = async () => {
-      setLoading(true);
+    const fetchData = async (quiet) => {
+      if (!quiet) setLoading(true);
       try {
         const [sum, mon, invoices] = await Promise.all([
           api.get('/dashboard/summary'),
           api.get('/dashboard/monthly-revenue'),
-          api.get('/invoices/'),
+          api.getAll('/invoices/'),
         ]);
         setSummary(sum);
         setMonthly(mon);
@@ -188,6 +188,8 @@ function Dashboard() {
       setLoading(false);
     };
     fetchData();
+    // Refresh in place when the team's data changes; unchanged endpoints answer 304
+    return api.subscribe(() => fetchData(true));
   }, []);
 
   const stats = [
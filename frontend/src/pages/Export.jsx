@@ -117,7 +117,7 @@ function Export() {
       try {
         const [summary, invoices] = await Promise.all([
           api.get('/dashboard/summary'),
-          api.get('/invoices/')
+          api.getAll('/invoices/')
         ]);
         
         // Calculate this month's invoices
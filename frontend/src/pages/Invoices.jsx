@@ -1,5 +1,5 @@
-import { useEffect, useState } from 'react';
-import { api } from '../api';
+import { useEffect, useRef, useState } from 'react';
+import { api, mergeChanges } from '../api';
 import { useTranslation } from 'react-i18next';
 import { FileText, Plus, Download, Trash2, DollarSign, Calendar, User, MoreVertical, Eye, Edit, Minus } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
@@ -178,6 +178,9 @@ function LineItemRow({ item, onUpdate, onRemove }) {
   );
 }
 
+// Same order as the invoice list endpoint
+const newestFirst = (a, b) => (b.created_at || '').localeCompare(a.created_at || '') || b.id - a.id;
+
 function Invoices() {
   const { t } = useTranslation();
   const [invoices, setInvoices] = useState([]);
@@ -193,13 +196,18 @@ function Invoices() {
   const [showForm, setShowForm] = useState(false);
   const [filterStatus, setFilterStatus] = useState('all');
 
+  const syncVersion = useRef(null);
+
   const fetchData = async () => {
     setLoading(true);
     try {
+      // Take the version first: anything written during the load comes back in the next sync
+      const { version } = await api.sync(null);
       const [inv, cli] = await Promise.all([
-        api.get('/invoices/'),
-        api.get('/clients/'),
+        api.getAll('/invoices/'),
+        api.getAll('/clients/'),
       ]);
+      syncVersion.current = version;
       setInvoices(inv);
       setClients(cli);
     } catch (err) {
@@ -208,8 +216,28 @@ function Invoices() {
     setLoading(false);
   };
 
+  // After a mutation, pull only what changed instead of both lists
+  const refreshData = async () => {
+    // Still loading; that load already covers it
+    if (!syncVersion.current) return;
+    try {
+      const changes = await api.sync(syncVersion.current);
+      if (changes.reset) {
+        await fetchData();
+        return;
+      }
+      syncVersion.current = changes.version;
+      setInvoices(rows => mergeChanges(rows, changes.invoices, changes.deleted.invoices, newestFirst));
+      setClients(rows => mergeChanges(rows, changes.clients, changes.deleted.clients, (a, b) => a.id - b.id));
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
   useEffect(() => {
     fetchData();
+    // Pick up writes by other team members as they happen
+    return api.subscribe(() => refreshData());
   }, []);
 
   const handleFormChange = (e) => {
@@ -272,7 +300,7 @@ function Invoices() {
         items: [{ description: '', quantity: 1, unit_price: 0, total: 0 }]
       });
       setShowForm(false);
-      fetchData();
+      refreshData();
     } catch (err) {
       setError(err.message);
     }
@@ -283,7 +311,7 @@ function Invoices() {
     if (!window.confirm(t('delete') + '?')) return;
     try {
       await api.delete(`/invoices/${id}`);
-      fetchData();
+      refreshData();
     } catch (err) {
       setError(err.message);
     }
@@ -292,7 +320,7 @@ function Invoices() {
   const handleStatus = async (id, status) => {
     try {
       await api.patch(`/invoices/${id}/status`, { status });
-      fetchData();
+      refreshData();
     } catch (err) {
       setError(err.message);
     }
@@ -19,6 +19,18 @@ import {
   Edit
 } from 'lucide-react';
 
+// Same rules as the server's validate_number_format, checked here to show the error in French
+const NUMBER_FORMAT_FIELD = /\{(\w*)(?::[^{}]*)?\}/g;
+
+function numberFormatError(format) {
+  if (!format) return null;
+  const fields = [...format.replace(/\{\{|\}\}/g, '').matchAll(NUMBER_FORMAT_FIELD)].map((m) => m[1]);
+  if (fields.filter((f) => f === 'n').length !== 1 || fields.some((f) => f !== 'n' && f !== 'year')) {
+    return 'Le format du numéro de facture doit contenir {n} une seule fois et ne peut utiliser que {n} et {year}';
+  }
+  return null;
+}
+
 function Team() {
   const { t } = useTranslation();
   const [team, setTeam] = useState(null);
@@ -33,7 +45,8 @@ function Team() {
     professional_tax_number: '',
     address: '',
     phone: '',
-    email: ''
+    email: '',
+    invoice_number_format: ''
   });
   const [logoUploading, setLogoUploading] = useState(false);
   const [saving, setSaving] = useState(false);
@@ -52,7 +65,8 @@ function Team() {
         professional_tax_number: data.professional_tax_number || '',
         address: data.address || '',
         phone: data.phone || '',
-        email: data.email || ''
+        email: data.email || '',
+        invoice_number_format: data.invoice_number_format || ''
       });
     } catch (err) {
       setError(err.message);
@@ -95,6 +109,11 @@ function Team() {
 
   const handleBusinessFormSubmit = async (e) => {
     e.preventDefault();
+    const formatError = numberFormatError(businessForm.invoice_number_format);
+    if (formatError) {
+      setError(formatError);
+      return;
+    }
     setSaving(true);
     setError(null);
     try {
@@ -318,6 +337,20 @@ function Team() {
                   <p className="text-xs text-gray-500 mt-1">Numéro de Taxe Professionnelle</p>
                 </div>
 
+                <div>
+                  <label className="block text-sm font-semibold text-gray-700 mb-2">
+                    Format du numéro de facture
+                  </label>
+                  <input
+                    name="invoice_number_format"
+                    value={businessForm.invoice_number_format}
+                    onChange={handleBusinessFormChange}
+                    placeholder="FAC-{year}-{n:04d}"
+                    className="w-full p-4 border border-gray-200 rounded-xl focus:ring-2 focus:ring-blue-500 focus:border-transparent shadow-sm transition-all duration-200"
+                  />
+                  <p className="text-xs text-gray-500 mt-1">{'{n}'} est le numéro séquentiel ; avec {'{year}'}, la numérotation repart à 1 chaque année</p>
+                </div>
+
                 <div>
                   <label className="block text-sm font-semibold text-gray-700 mb-2">
                     Phone